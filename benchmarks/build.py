@@ -0,0 +1,133 @@
+"""
+Times building synthetic sites and writes the results as JSON, so runs
+can be compared across commits.
+
+    python benchmarks/build.py [--output results.json] [--jobs N] [--repeat N]
+        [--posts N] [--paragraphs N] [--code-density F] [--template-complexity N] ...
+
+Each run builds the site from scratch ("clean"), then again without
+changes ("noop"), in a fresh process. Besides the wall time, peak memory
+(of the build and its workers) and the time of each stage are recorded.
+Stages are the profiler phases of the build, see --profile.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import sitegen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stages reported in the summary, by profiler phase
+STAGES = ("discovery", "parse", "generate", "markdown", "render", "write",
+          "after_all hook: generate_archive",
+          "after_all hook: generate_paginated_blog_index",
+          "after_all hook: copy_static_files",
+          "compress", "manifest")
+
+def build(directory, jobs):
+    """Builds the site in directory in a new process. Returns the wall time,
+    the peak resident memory, the profiler phases and the build's stats
+    """
+    timings = os.path.join(directory, "timings.json")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    devnull = open(os.devnull, 'w')
+    try:
+        started = time.time()
+        process = subprocess.Popen([sys.executable, "-m", "racconto", "--generate",
+                                    "--jobs", str(jobs), "--profile-output", timings],
+                                   cwd=directory, env=env, stdout=devnull)
+        # The usage of the build and the workers it waited for
+        pid, status, usage = os.wait4(process.pid, 0)
+        seconds = time.time() - started
+    finally:
+        devnull.close()
+    if status != 0:
+        raise RuntimeError("Build in %s failed" % directory)
+
+    f = open(timings)
+    try:
+        profile = json.load(f)
+    finally:
+        f.close()
+    phases = profile["phases"]
+    return {"seconds": round(seconds, 4),
+            # Kilobytes on linux
+            "peak_memory_kb": usage.ru_maxrss,
+            "stages": dict((stage, round(phases[stage]["seconds"], 4))
+                           for stage in STAGES if stage in phases),
+            "phases": phases,
+            # Files written and fragment cache hits
+            "stats": profile.get("stats", {}),
+            }
+
+def run(site, jobs=1, repeat=3):
+    """Generates the site and builds it repeat times. Returns the
+    fastest clean and no-op build
+    """
+    directory = tempfile.mkdtemp(prefix="racconto-benchmark-")
+    try:
+        sitegen.generate(directory, **site)
+        results = {"clean": [], "noop": []}
+        for i in range(repeat):
+            for path in ("site", ".racconto-manifest", ".racconto-cache"):
+                path = os.path.join(directory, path)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            results["clean"].append(build(directory, jobs))
+            results["noop"].append(build(directory, jobs))
+    finally:
+        shutil.rmtree(directory)
+    return dict((kind, min(builds, key=lambda result: result["seconds"]))
+                for kind, builds in results.items())
+
+def revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=ROOT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks racconto builds")
+    sitegen.add_arguments(parser)
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="builds of each kind, the fastest is kept")
+    parser.add_argument('--output', metavar="FILE", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    site = sitegen.site_arguments(args)
+    results = run(site, args.jobs, args.repeat)
+    report = {"revision": revision(),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "jobs": args.jobs,
+              "site": site,
+              "results": results,
+              }
+
+    for kind in ("clean", "noop"):
+        result = results[kind]
+        print "%-6s %8.3fs %8d KB" % (kind, result["seconds"], result["peak_memory_kb"])
+        for stage in STAGES:
+            if stage in result["stages"]:
+                print "    %-50s %8.3fs" % (stage, result["stages"][stage])
+
+    if args.output:
+        f = open(args.output, 'w')
+        try:
+            json.dump(report, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+if __name__ == '__main__':
+    main()
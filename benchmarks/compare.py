@@ -0,0 +1,45 @@
+"""
+Compares two result files written by benchmarks/build.py.
+
+    python benchmarks/compare.py BEFORE.json AFTER.json
+"""
+import json
+import sys
+
+from build import STAGES
+
+def load(path):
+    f = open(path)
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+def change(before, after):
+    if not before:
+        return ""
+    return "%+.1f%%" % ((after - before) * 100.0 / before)
+
+def main(before_path, after_path):
+    before, after = load(before_path), load(after_path)
+    if before["site"] != after["site"] or before["jobs"] != after["jobs"]:
+        print "Warning: the results are of different sites or job counts"
+    print "%-56s %10s %10s %8s" % ("%s -> %s" % (before["revision"], after["revision"]),
+                                   "Before", "After", "Change")
+    for kind in ("clean", "noop"):
+        old, new = before["results"][kind], after["results"][kind]
+        print "%-56s %9.3fs %9.3fs %8s" % (kind, old["seconds"], new["seconds"],
+                                           change(old["seconds"], new["seconds"]))
+        print "%-56s %8dKB %8dKB %8s" % ("    peak memory", old["peak_memory_kb"],
+                                         new["peak_memory_kb"],
+                                         change(old["peak_memory_kb"], new["peak_memory_kb"]))
+        for stage in STAGES:
+            if stage in old["stages"] or stage in new["stages"]:
+                seconds = old["stages"].get(stage, 0.0), new["stages"].get(stage, 0.0)
+                print "%-56s %9.3fs %9.3fs %8s" % ("    " + stage, seconds[0], seconds[1],
+                                                   change(*seconds))
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip())
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,54 @@
+"""
+Times classifying source paths as posts or pages.
+
+    python benchmarks/filenames.py [count]
+"""
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, ".")
+
+from racconto.filenames import FilenameClassifier
+
+def filenames(count):
+    paths = []
+    for i in range(count):
+        if i % 10 == 0:
+            paths.append("./content/page-%d.md" % i)
+        else:
+            paths.append("./content/%04d-%02d-%02d-post-number-%d.md" % (
+                2000 + i % 20, 1 + i % 12, 1 + i % 28, i))
+    return paths
+
+def strptime_classify(filepath):
+    """The classification racconto did before, for comparison """
+    filename = filepath.split('/')[-1:][0]
+    possible_date = " ".join(filename.split('-')[0:3])
+    try:
+        return "post", datetime.strptime(possible_date, "%Y %m %d")
+    except ValueError:
+        return "page", None
+
+def main(count):
+    paths = filenames(count)
+    print "%d filenames" % count
+
+    seconds = min(timeit.repeat(lambda: [strptime_classify(p) for p in paths], number=1, repeat=3))
+    print "strptime:           %.3fs" % seconds
+
+    def uncached():
+        classifier = FilenameClassifier(["YYYY-MM-DD-slug"])
+        for path in paths:
+            classifier.classify(path)
+    seconds = min(timeit.repeat(uncached, number=1, repeat=3))
+    print "classifier:         %.3fs" % seconds
+
+    classifier = FilenameClassifier(["YYYY-MM-DD-slug"])
+    for path in paths:
+        classifier.classify(path)
+    seconds = min(timeit.repeat(lambda: [classifier.classify(p) for p in paths], number=1, repeat=3))
+    print "classifier, cached: %.3fs" % seconds
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
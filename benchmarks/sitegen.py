@@ -0,0 +1,158 @@
+"""
+Generates a synthetic racconto site to benchmark builds with.
+
+    python benchmarks/sitegen.py DIRECTORY [--posts N] [--pages N]
+        [--paragraphs N] [--code-density F] [--template-complexity N]
+        [--static-files N]
+"""
+import argparse
+import os
+import random
+import shutil
+from datetime import date, timedelta
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+         "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo").split()
+
+CODE = '''```python
+def fibonacci(n):
+    a, b = 0, 1
+    for i in range(n):
+        a, b = b, a + b
+    return a
+```'''
+
+SETTINGS = '''from racconto.hooks.manager import HooksManager
+from racconto import hooks
+
+HooksManager.register_after_all_hook(hooks.generate_archive)
+HooksManager.register_after_all_hook(hooks.generate_paginated_blog_index)
+HooksManager.register_after_all_hook(hooks.copy_static_files)
+'''
+
+def templates(complexity):
+    """Returns {name: source}. complexity is the number of nested
+    blocks, macro calls and loop iterations per page
+    """
+    nested = "".join("{%% block b%d %%}<div>" % i for i in range(complexity))
+    nested += "{% block content %}{% endblock %}"
+    nested += "".join("</div>{% endblock %}" for i in range(complexity))
+    macros = ('{% macro tag(name, index) %}'
+              '<a class="tag-{{ index }}" href="/tags/{{ name|lower }}/">{{ name|title }}</a>'
+              '{% endmacro %}')
+    item = ('<li><a href="/{{ post.filepath }}/">{{ post.title }}</a> '
+            '{{ post.date.strftime("%Y-%m-%d") }}</li>')
+    listing = '<ul>{% for post in post_list %}' + item + '{% endfor %}</ul>'
+    return {
+        "base.j2": ('<!DOCTYPE html><html><head><title>{% block title %}{% endblock %}</title>'
+                    '<link rel="stylesheet" href="{{ \'css/site.css\'|asset_url }}"></head>'
+                    '<body>{% include "nav.j2" %}' + nested + '</body></html>'),
+        "nav.j2": ('<nav>{% for i in range(' + str(complexity) + ') %}'
+                   '<a href="/section-{{ i }}/">Section {{ i }}</a>{% endfor %}</nav>'),
+        "post.j2": ('{% extends "base.j2" %}' + macros +
+                    '{% block title %}{{ title }}{% endblock %}'
+                    '{% block content %}<article><h1>{{ title }}</h1>'
+                    '<time>{{ date.strftime("%B %d, %Y") }}</time>'
+                    '{% for name in tags %}{{ tag(name, loop.index) }}{% endfor %}'
+                    '{% for i in range(' + str(complexity) + ') %}'
+                    '{{ tag(title, i) }}{% endfor %}'
+                    '{{ body }}</article>{% endblock %}'),
+        "page.j2": ('{% extends "base.j2" %}{% block title %}{{ title }}{% endblock %}'
+                    '{% block content %}<h1>{{ title }}</h1>{{ body }}{% endblock %}'),
+        "index.j2": ('{% extends "base.j2" %}{% block content %}' + listing +
+                     '{% if previous_url %}<a href="{{ previous_url }}">Newer</a>{% endif %}'
+                     '{% if next_url %}<a href="{{ next_url }}">Older</a>{% endif %}'
+                     '{% endblock %}'),
+        "year_archive.j2": '{% extends "base.j2" %}{% block content %}' + listing + '{% endblock %}',
+        "month_archive.j2": '{% extends "base.j2" %}{% block content %}' + listing + '{% endblock %}',
+        "day_archive.j2": '{% extends "base.j2" %}{% block content %}' + listing + '{% endblock %}',
+        }
+
+def paragraph(rand, words=60):
+    return " ".join(rand.choice(WORDS) for i in range(words)).capitalize() + "."
+
+def body(rand, paragraphs, code_density):
+    """Returns markdown with paragraphs blocks, code_density of which
+    are fenced code blocks
+    """
+    blocks = []
+    for i in range(paragraphs):
+        if rand.random() < code_density:
+            blocks.append(CODE)
+        elif i % 5 == 0:
+            blocks.append("## %s" % paragraph(rand, 4))
+        else:
+            blocks.append(paragraph(rand))
+    return "\n\n".join(blocks)
+
+def generate(directory, posts=1000, pages=10, paragraphs=10, code_density=0.1,
+             template_complexity=3, static_files=50, seed=1):
+    """Writes a site to directory, replacing what was there. The same
+    arguments and seed always generate the same site.
+    """
+    rand = random.Random(seed)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    for name in ("content", "templates", "static/css", "static/js"):
+        os.makedirs(os.path.join(directory, name))
+
+    write(os.path.join(directory, "settings.py"), SETTINGS)
+    for name, source in templates(template_complexity).items():
+        write(os.path.join(directory, "templates", name), source)
+
+    first = date(2000, 1, 1)
+    for i in range(posts):
+        day = first + timedelta(days=i * 3 // 2)
+        tags = rand.sample(WORDS, 3)
+        path = os.path.join(directory, "content", str(day.year),
+                            "%s-post-%d.md" % (day.isoformat(), i))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        write(path, "---\ntitle: Post number %d\ntags: [%s]\n---\n\n%s\n" % (
+            i, ", ".join(tags), body(rand, paragraphs, code_density)))
+    for i in range(pages):
+        write(os.path.join(directory, "content", "page-%d.md" % i),
+              "---\ntitle: Page %d\n---\n\n%s\n" % (i, body(rand, paragraphs, code_density)))
+
+    write(os.path.join(directory, "static", "css", "site.css"),
+          "body { font-family: sans-serif; }\n" * 200)
+    for i in range(static_files):
+        write(os.path.join(directory, "static", "js", "script-%d.js" % i),
+              "var value%d = %d;\n" % (i, i) * rand.randint(10, 1000))
+
+def write(path, data):
+    f = open(path, 'w')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+def add_arguments(parser):
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--paragraphs', type=int, default=10,
+                        help="markdown blocks per post, the body size")
+    parser.add_argument('--code-density', type=float, default=0.1,
+                        help="fraction of blocks which are fenced code")
+    parser.add_argument('--template-complexity', type=int, default=3,
+                        help="nested blocks, macro calls and loop iterations per page")
+    parser.add_argument('--static-files', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+
+def site_arguments(args):
+    return {"posts": args.posts,
+            "pages": args.pages,
+            "paragraphs": args.paragraphs,
+            "code_density": args.code_density,
+            "template_complexity": args.template_complexity,
+            "static_files": args.static_files,
+            "seed": args.seed,
+            }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates a synthetic racconto site")
+    parser.add_argument('directory')
+    add_arguments(parser)
+    args = parser.parse_args()
+    generate(args.directory, **site_arguments(args))
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 import argparse
 import codecs
-import os, glob, shutil
+import cProfile
+import os, shutil
 
-from racconto.parsers import *
-from racconto.hooks.manager import HooksManager
+from racconto.builder import SiteBuilder
+from racconto.fragments import FragmentCache
 from racconto.generator import Generator
+from racconto.profiler import Profiler
+from racconto.server import serve
 from racconto.settings_manager import SettingsManager as SETTINGS
 
 # Import settings from project where racconto is used
@@ -15,49 +18,50 @@ try:
 except ImportError, e:
     pass
 
-def compile_site():
+def compile_site(jobs=1, cache=True, profile=False, profile_top=10, profile_output=None):
     if PROJECT_SETTINGS:
         SETTINGS.override(PROJECT_SETTINGS)
 
-    # Setup template environment
-    Generator.setup_jinja_environment(SETTINGS.get('TEMPLATEDIR'))
-    for key, value in SETTINGS.get('FILTERS').items():
-        Generator.jinja_env.filters[key] = value
-
-    entries = glob.glob('./%s/*.md' % SETTINGS.get('CONTENTDIR'))
-    posts, pages = [], []
-
-    # Parse content
-    parser = RaccontoParser()
-    for f in entries:
-        parsed_file = parser.parse(f)
-
-        if parsed_file is None:
-            continue
-
-        if isinstance(parsed_file, Post):
-            posts.append(parsed_file)
-        elif isinstance(parsed_file, Page):
-            pages.append(parsed_file)
-
-    posts.sort() # Sort list of posts by date
-
-    # Run before all hooks
-    HooksManager.run_before_all_hooks(pages, posts)
-
-    # Generate site
-    for parsed_file in pages:
-        HooksManager.run_before_each_hooks(parsed_file)
-        Generator.generate(parsed_file, SETTINGS.get('SITEDIR'))
-    for parsed_file in posts:
-        HooksManager.run_before_each_hooks(parsed_file)
-        Generator.generate(parsed_file, SETTINGS.get('BLOGDIR'))
+    Generator.pop_stats()
+    FragmentCache.pop_stats()
+    Profiler.enabled = profile
+    builder = SiteBuilder(jobs, cache)
+    if profile_output and profile_output.endswith('.prof'):
+        function_profile = cProfile.Profile()
+        result = function_profile.runcall(builder.build)
+        function_profile.dump_stats(profile_output)
+    else:
+        result = builder.build()
+
+    stats = Generator.pop_stats()
+    print "Done! %d of %d files generated" % (result["generated"], result["sources"])
+    print "%d files written, %d files unchanged" % (stats["written"], stats["skipped"])
+    fragments = FragmentCache.pop_stats()
+    if fragments["hits"] or fragments["misses"]:
+        print "%d fragments cached, %d rendered (%.1f%% hit rate)" % (
+            fragments["hits"], fragments["misses"], FragmentCache.hit_rate(fragments))
+
+    if Profiler.enabled:
+        print
+        Profiler.report(profile_top)
+        if profile_output and not profile_output.endswith('.prof'):
+            Profiler.dump(profile_output, profile_top,
+                          {"files": stats, "fragments": fragments})
+
+def serve_site(port, cache=True):
+    if PROJECT_SETTINGS:
+        SETTINGS.override(PROJECT_SETTINGS)
 
-    # Run after all hooks
-    HooksManager.run_after_all_hooks(pages, posts)
+    serve(SiteBuilder(1, cache), port)
 
-    print "Done!"
+def compile_templates():
+    if PROJECT_SETTINGS:
+        SETTINGS.override(PROJECT_SETTINGS)
 
+    # Templates are compiled with the filters the builder registers
+    SiteBuilder()
+    count = Generator.compile_templates(SETTINGS.get('COMPILED_TEMPLATES_DIR'))
+    print "Compiled %d templates to %s" % (count, SETTINGS.get('COMPILED_TEMPLATES_DIR'))
 
 def clean_site():
     if PROJECT_SETTINGS:
@@ -65,6 +69,9 @@ def clean_site():
 
     shutil.rmtree(SETTINGS.get('SITEDIR'))
     os.makedirs(SETTINGS.get('SITEDIR'))
+    # Nothing generated is left, so the next build must be a full one
+    if os.path.exists(SETTINGS.get('MANIFEST_FILE')):
+        os.remove(SETTINGS.get('MANIFEST_FILE'))
     print "Clean"
 
 def create_directory_structure():
@@ -88,6 +95,23 @@ def main():
                        help="generates the site")
     parser.add_argument('-C', '--clean', action="store_true",
                        help="cleans the site directory prior to generate. Used in conjuction with -g")
+    parser.add_argument('--compile-templates', action="store_true",
+                       help="precompiles the templates, which are then loaded precompiled until modified")
+    parser.add_argument('-s', '--serve', action="store_true",
+                       help="generates the site, serves it and regenerates it when content, templates or static files change")
+    parser.add_argument('-p', '--port', type=int, default=8000,
+                       help="port the site is served on. Used in conjuction with -s")
+    parser.add_argument('--no-cache', action="store_true",
+                       help="don't use the on-disk caches of markdown converted to html "
+                            "and of template fragments")
+    parser.add_argument('--profile', action="store_true",
+                       help="prints the time spent in each phase of the build and the slowest files and templates")
+    parser.add_argument('--profile-top', type=int, default=10, metavar="N",
+                       help="number of slowest files and templates to print. Used in conjuction with --profile")
+    parser.add_argument('--profile-output', metavar="FILE",
+                       help="writes the timings to FILE as JSON, or a cProfile dump if FILE ends with .prof")
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar="N",
+                       help="number of processes used to parse and render. 0 uses all CPU cores")
 
     args = parser.parse_args()
 
@@ -95,7 +119,13 @@ def main():
         if args.clean == True:
             clean_site()
 
-        compile_site()
+        compile_site(args.jobs, not args.no_cache,
+                     args.profile or args.profile_output is not None,
+                     args.profile_top, args.profile_output)
+    elif args.serve == True:
+        serve_site(args.port, not args.no_cache)
+    elif args.compile_templates == True:
+        compile_templates()
     elif args.create == True:
         create_directory_structure()
     elif args.clean == True:
@@ -0,0 +1,144 @@
+import json
+import os
+
+from jinja2 import contextfilter
+
+from racconto.files import atomic_write
+from racconto.settings_manager import SettingsManager as SETTINGS
+from racconto.static import file_hash
+
+class AssetManifest(object):
+    """
+    Maps static files to fingerprinted names, with a hash of their content
+    in the name (css/app.css -> css/app.3f9c1a04be.css), so they can be
+    served with far-future cache headers. The manifest is kept on disk and
+    a file is only hashed again when its size or mtime changed.
+    """
+
+    HASH_LENGTH = 10
+
+    path = None
+    # relative path -> {"fingerprinted", "hash", "size", "mtime"}
+    assets = {}
+    # relative path -> fingerprinted path or None, of the assets asset_url
+    # resolved since the last pop_used
+    used = {}
+
+    @classmethod
+    def update(cls, directory, manifest_path, exclude=()):
+        """Brings the manifest at manifest_path up to date with the files
+        in directory. Files named in exclude at the top of directory are
+        not fingerprinted.
+        """
+        if cls.path != manifest_path:
+            cls.path = manifest_path
+            cls.assets = cls._load(manifest_path)
+
+        assets = {}
+        for root, dirs, files in os.walk(directory):
+            relative_root = os.path.relpath(root, directory)
+            for name in files:
+                if relative_root == os.curdir:
+                    if name in exclude:
+                        continue
+                    relative = name
+                else:
+                    relative = "%s/%s" % (relative_root.replace(os.sep, "/"), name)
+                stat = os.stat(os.path.join(root, name))
+                asset = cls.assets.get(relative)
+                if asset is None or (asset["size"], asset["mtime"]) != (stat.st_size, stat.st_mtime):
+                    digest = file_hash(os.path.join(root, name))
+                    base, extension = os.path.splitext(relative)
+                    asset = {"fingerprinted": "%s.%s%s" % (base, digest[:cls.HASH_LENGTH], extension),
+                             "hash": digest,
+                             "size": stat.st_size,
+                             "mtime": stat.st_mtime,
+                             }
+                assets[relative] = asset
+
+        changed = assets != cls.assets
+        cls.assets = assets
+        if changed or not os.path.exists(manifest_path):
+            cls._save(manifest_path, assets)
+
+    @classmethod
+    def fingerprints(cls):
+        """Returns {relative path: fingerprinted relative path} """
+        return dict((relative, asset["fingerprinted"])
+                    for relative, asset in cls.assets.iteritems())
+
+    @classmethod
+    def resolve(cls, relative):
+        """Returns the fingerprinted path of relative, None if it isn't
+        fingerprinted
+        """
+        asset = cls.assets.get(relative)
+        return asset and asset["fingerprinted"]
+
+    @classmethod
+    def pop_used(cls):
+        """Returns the assets resolved by asset_url since the previous
+        call, what a render used, and forgets them
+        """
+        used = cls.used
+        cls.used = {}
+        return used
+
+    @classmethod
+    def use(cls, used):
+        """Records assets resolved elsewhere, e.g. by a cached fragment """
+        cls.used.update(used)
+
+    @classmethod
+    def changed(cls, used):
+        """Returns True if any of the assets in used, as returned by
+        pop_used, resolves to another path now
+        """
+        return any(cls.resolve(relative) != fingerprinted
+                   for relative, fingerprinted in (used or {}).iteritems())
+
+    @classmethod
+    def reset(cls):
+        cls.path = None
+        cls.assets = {}
+        cls.used = {}
+
+    @staticmethod
+    def _load(path):
+        try:
+            f = open(path)
+        except IOError:
+            return {}
+        try:
+            return json.load(f)
+        except ValueError:
+            return {}
+        finally:
+            f.close()
+
+    @staticmethod
+    def _save(path, assets):
+        with atomic_write(path, 'w') as f:
+            json.dump(assets, f, indent=1, sort_keys=True)
+
+def asset_url(path):
+    """Jinja filter and global returning the URL of a static file, given
+    its path in STATICDIR. With FINGERPRINT_STATIC the URL is the one of
+    the fingerprinted file.
+    """
+    relative = path.lstrip("/")
+    fingerprinted = AssetManifest.used[relative] = AssetManifest.resolve(relative)
+    return "/%s/%s" % (SETTINGS.get('STATICDIR'), fingerprinted or relative)
+
+@contextfilter
+def asset_url_filter(context, path):
+    """asset_url as a jinja filter. Being a context filter, jinja doesn't
+    resolve it when compiling templates with a constant path, it is
+    resolved, and recorded as used, when rendering.
+    """
+    return asset_url(path)
+
+def asset_manifest_path():
+    """Returns the path of the asset manifest in the generated site """
+    return "%s/%s/%s" % (SETTINGS.get('SITEDIR'), SETTINGS.get('STATICDIR'),
+                         SETTINGS.get('ASSET_MANIFEST'))
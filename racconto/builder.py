@@ -0,0 +1,224 @@
+import os
+from itertools import izip
+
+from racconto.assets import AssetManifest, asset_manifest_path, asset_url, asset_url_filter
+from racconto.cache import MarkdownCache
+from racconto.compress import Compressor, remove_siblings
+from racconto.context import SiteContext
+from racconto.discovery import discover
+from racconto.fragments import FragmentCache
+from racconto.generator import Generator
+from racconto.hooks.manager import HooksManager
+from racconto.manifest import BuildManifest
+from racconto.models import Post, Page
+from racconto.parsers import RaccontoParser
+from racconto.profiler import Profiler
+from racconto.settings_manager import SettingsManager as SETTINGS
+from racconto.workers import Workers
+
+class SiteBuilder(object):
+    """
+    Builds the site from CONTENTDIR and TEMPLATEDIR.
+    The jinja environment, the build manifest and the parsed content are
+    kept between builds, so repeated builds (as done by the dev server)
+    only parse and render what changed.
+    """
+
+    def __init__(self, jobs=1, cache=True):
+        self.jobs = jobs
+
+        # Setup template environment
+        Generator.setup_jinja_environment(SETTINGS.get('TEMPLATEDIR'),
+                                          SETTINGS.get('TEMPLATE_CACHE_DIR'),
+                                          SETTINGS.get('COMPILED_TEMPLATES_DIR'))
+        filters = {"asset_url": asset_url_filter}
+        filters.update(SETTINGS.get('FILTERS'))
+        for key, value in filters.items():
+            Generator.jinja_env.filters[key] = value
+        Generator.jinja_env.globals["asset_url"] = SETTINGS.get('FILTERS').get("asset_url",
+                                                                            asset_url)
+
+        Compressor.setup(SETTINGS.get('PRECOMPRESS'),
+                         SETTINGS.get('PRECOMPRESS_MIN_SIZE'),
+                         SETTINGS.get('PRECOMPRESS_EXTENSIONS'))
+
+        if cache:
+            MarkdownCache.setup(SETTINGS.get('MARKDOWN_CACHE_DIR'),
+                                SETTINGS.get('MARKDOWN_CACHE_SIZE'))
+            FragmentCache.setup(SETTINGS.get('FRAGMENT_CACHE_DIR'),
+                                SETTINGS.get('FRAGMENT_CACHE_SIZE'))
+
+        # Load what the previous build was made from
+        self.manifest = BuildManifest(SETTINGS.get('MANIFEST_FILE'))
+        self.manifest.load()
+
+        Generator.manifest = self.manifest
+
+        # Parsed content by source path
+        self.content = {}
+
+    def build(self, changed=None):
+        """
+        Builds the site. changed is the set of paths which changed since
+        the previous build, or None if unknown.
+        Returns a dict with the number of sources and of generated files.
+        """
+        manifest = self.manifest
+        jinja_env = Generator.jinja_env
+        if changed is not None and self._templates_changed(changed):
+            Generator.reload_templates()
+        if changed is None or self._templates_changed(changed):
+            manifest.forget_templates()
+
+        # Fingerprints must be known before templates are rendered
+        if SETTINGS.get('FINGERPRINT_STATIC'):
+            with Profiler.timer("assets"):
+                AssetManifest.update(SETTINGS.get('STATICDIR'), asset_manifest_path(),
+                                     SETTINGS.get('STATIC_ROOT_FILES'))
+        else:
+            AssetManifest.reset()
+        # Content rendered with other settings is outdated, content
+        # linking to assets which changed is found by fresh_record
+        manifest.check_settings(SETTINGS.settings)
+        # Fragments are kept for this build, and between builds if they
+        # were rendered with the same settings and templates
+        FragmentCache.start(manifest.settings,
+                            lambda name: manifest.template_sources_digest(jinja_env, name))
+
+        entries, digests, records, stats = [], {}, {}, {}
+
+        def stale_sources():
+            # Sources are handed to the parser as they are discovered.
+            # Unchanged files are restored from the manifest, their
+            # markdown is only read if a hook needs their body
+            for f, stat in discover(SETTINGS.get('CONTENTDIR'),
+                                    ignore_patterns=SETTINGS.get('IGNORE_PATTERNS')):
+                with Profiler.timer("change detection"):
+                    # Recorded with the digest, a file saved during the
+                    # build is read again by the next one
+                    digests[f], stats[f] = manifest.source_digest(f, stat), stat
+                    records[f] = manifest.fresh_record(f, digests[f], jinja_env)
+                entries.append(f)
+                if records[f] is None:
+                    yield f
+
+        workers = Workers(self.jobs)
+        posts, pages = [], []
+
+        # Unless a hook needs them all at once, bodies are read when each
+        # file is rendered and released once it is written, only the front
+        # matter of the whole site is kept in memory
+        keep_bodies = HooksManager.needs_bodies()
+
+        # Parse content
+        parsed_files = dict(workers.parse(stale_sources(), not keep_bodies))
+        stale = set(parsed_files)
+
+        for record in manifest.prune(entries):
+            # Source was removed, remove what was generated from it
+            remove_generated_file(record["output"])
+        # A newly registered aggregate hook must run
+        aggregate_hooks = HooksManager.aggregate_hooks()
+        with Profiler.timer("change detection"):
+            rebuild_aggregates = manifest.aggregates_changed(digests, jinja_env, aggregate_hooks)
+
+        parser = RaccontoParser()
+        content = {}
+        for f in entries:
+            if f in parsed_files:
+                parsed_file = parsed_files[f]
+            elif f in self.content:
+                parsed_file = self.content[f]
+            else:
+                parsed_file = parser.restore(f, records[f])
+
+            if parsed_file is None:
+                continue
+            content[f] = parsed_file
+
+            if isinstance(parsed_file, Post):
+                posts.append(parsed_file)
+            elif isinstance(parsed_file, Page):
+                pages.append(parsed_file)
+        self.content = content
+
+        posts.sort() # Sort list of posts by date
+
+        # The site global, built once and shared by every render
+        site = SiteContext(pages, posts, SETTINGS.settings, digests)
+        Generator.set_global("site", site, site.digest)
+
+        # Run before all hooks
+        HooksManager.run_before_all_hooks(pages, posts, rebuild_aggregates)
+        if manifest.update_globals(Generator.global_digests):
+            # Hooks changed template globals, content rendered with
+            # templates using them is outdated. The aggregates signature
+            # is recorded again to cover them.
+            rebuild_aggregates = manifest.aggregates_changed(digests, jinja_env,
+                                                             aggregate_hooks) or \
+                rebuild_aggregates
+            for f in entries:
+                if f not in stale and f in content and \
+                        manifest.fresh_record(f, digests[f], jinja_env) is None:
+                    stale.add(f)
+        # Render in processes forked after the hooks, which may have
+        # set template globals
+        workers.close()
+        workers = Workers(self.jobs)
+
+        # Run before each hooks, in order, before any rendering starts
+        renders = []
+        for parsed_file in pages:
+            if parsed_file.source in stale:
+                HooksManager.run_before_each_hooks(parsed_file)
+                renders.append((parsed_file, SETTINGS.get('SITEDIR')))
+        for parsed_file in posts:
+            if parsed_file.source in stale:
+                HooksManager.run_before_each_hooks(parsed_file)
+                renders.append((parsed_file, SETTINGS.get('BLOGDIR')))
+
+        # Generate site, after each hooks run in the same order
+        for (parsed_file, directory), (output, assets) in izip(renders,
+                                                               workers.generate(renders)):
+            HooksManager.run_after_each_hooks(parsed_file)
+            manifest.record(parsed_file.source, digests[parsed_file.source],
+                            parsed_file, jinja_env, output, assets,
+                            stats[parsed_file.source])
+            if not keep_bodies:
+                parsed_file.release_body()
+        workers.close()
+
+        # Run after all hooks
+        HooksManager.run_after_all_hooks(pages, posts, rebuild_aggregates)
+        if rebuild_aggregates:
+            # Remove index files the aggregate hooks no longer generate,
+            # e.g. archives of removed posts
+            for path in manifest.prune_index_files():
+                remove_generated_file(path)
+        # Content is kept between builds without bodies
+        for parsed_file in content.itervalues():
+            parsed_file.release_body()
+
+        with Profiler.timer("compress"):
+            Compressor.run(self.jobs)
+
+        with Profiler.timer("manifest"):
+            manifest.save()
+        with Profiler.timer("markdown cache"):
+            MarkdownCache.prune()
+            FragmentCache.prune()
+        return {"sources": len(entries), "generated": len(renders)}
+
+    def _templates_changed(self, changed):
+        templates = './%s/' % SETTINGS.get('TEMPLATEDIR')
+        return any(path.startswith(templates) for path in changed)
+
+def remove_generated_file(path):
+    """Removes a generated file and the directories it leaves empty """
+    if os.path.exists(path):
+        os.remove(path)
+        remove_siblings(path)
+        try:
+            os.removedirs(os.path.dirname(path))
+        except OSError:
+            pass
@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import markdown2
+
+from racconto.files import atomic_write
+
+class DiskCache(object):
+    """
+    On-disk cache of unicode text by key, shared between builds and
+    between build processes. A hit refreshes the entry's mtime, which
+    prune() uses to evict the least recently used entries once the
+    cache grows past max_size bytes. Subclasses define how keys are made.
+    """
+
+    directory = None
+    max_size = None
+
+    @classmethod
+    def setup(cls, directory, max_size=None):
+        """Enables the cache in directory. A directory of None disables it """
+        cls.directory = directory
+        cls.max_size = max_size
+
+    @classmethod
+    def get(cls, key):
+        """Returns the cached html for key or None """
+        if key is None:
+            return None
+        path = cls._path(key)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            html = f.read().decode('utf-8')
+        finally:
+            f.close()
+        try:
+            # Mark as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return html
+
+    @classmethod
+    def set(cls, key, html):
+        if key is None:
+            return
+        # Build processes may write the same entry concurrently
+        with atomic_write(cls._path(key)) as f:
+            f.write(html.encode('utf-8'))
+
+    @classmethod
+    def prune(cls):
+        """Removes the least recently used entries until the cache
+        is no larger than max_size
+        """
+        if cls.directory is None or cls.max_size is None:
+            return
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(cls.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= cls.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    @classmethod
+    def _path(cls, key):
+        return os.path.join(cls.directory, key[:2], "%s.html" % key)
+
+class MarkdownCache(DiskCache):
+    """
+    Cache of markdown converted to html. Entries are keyed by the
+    markdown source, the markdown extras and the markdown2 version.
+    """
+
+    directory = None
+    max_size = None
+
+    @classmethod
+    def key(cls, text, extras):
+        """Returns the cache key of text converted with extras,
+        or None if the cache is disabled
+        """
+        if cls.directory is None:
+            return None
+        h = hashlib.sha1()
+        h.update(markdown2.__version__)
+        h.update(repr(sorted(extras or [])))
+        h.update(text.encode('utf-8'))
+        return h.hexdigest()
@@ -0,0 +1,126 @@
+import gzip
+import multiprocessing
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from racconto.files import temporary_path
+
+# Bytes compressed at a time, large files are never read whole
+CHUNK_SIZE = 64 * 1024
+
+def _compress(path):
+    """Writes the .gz (and .br) siblings of path """
+    tmp_paths = [("%s.gz" % path, temporary_path("%s.gz" % path))]
+    if brotli is not None:
+        tmp_paths.append(("%s.br" % path, temporary_path("%s.br" % path)))
+    f = open(path, 'rb')
+    outputs = [open(tmp_path, 'wb') for sibling, tmp_path in tmp_paths]
+    try:
+        # mtime 0 keeps the compressed file identical between builds
+        gz = gzip.GzipFile(os.path.basename(path), 'wb', 9, outputs[0], 0)
+        br = brotli.Compressor() if brotli is not None else None
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ""):
+            gz.write(chunk)
+            if br is not None:
+                outputs[1].write(br.process(chunk))
+        gz.close()
+        if br is not None:
+            outputs[1].write(br.finish())
+    finally:
+        f.close()
+        for output in outputs:
+            output.close()
+    for sibling, tmp_path in tmp_paths:
+        shutil.copystat(path, tmp_path)
+        os.rename(tmp_path, sibling)
+    return path
+
+class Compressor(object):
+    """
+    Writes gzip (and brotli, if installed) compressed siblings of generated
+    text files, for web servers serving precompressed files (nginx
+    gzip_static). Files are queued as they are written and compressed in
+    a pool of processes at the end of the build. Siblings get the mtime of
+    the file, a file whose sibling is that recent is not compressed again.
+    """
+
+    enabled = False
+    min_size = 0
+    extensions = ()
+    # Paths to compress
+    pending = []
+
+    @classmethod
+    def setup(cls, enabled, min_size, extensions):
+        cls.enabled = enabled
+        cls.min_size = min_size
+        cls.extensions = tuple(extensions)
+
+    @classmethod
+    def suffixes(cls):
+        """Returns the suffixes of the compressed siblings """
+        if brotli is None:
+            return (".gz",)
+        return (".gz", ".br")
+
+    @classmethod
+    def queue(cls, path, changed=True):
+        """Queues path for compression if it is a text file above the size
+        threshold which changed or whose siblings are outdated
+        """
+        if not cls.enabled or not path.endswith(cls.extensions):
+            return
+        stat = os.stat(path)
+        if stat.st_size < cls.min_size:
+            # May have been larger before
+            remove_siblings(path)
+            return
+        if not changed:
+            for suffix in cls.suffixes():
+                try:
+                    # copystat may round the mtime of the sibling
+                    if os.stat(path + suffix).st_mtime < stat.st_mtime - 0.001:
+                        break
+                except OSError:
+                    break
+            else:
+                return
+        cls.pending.append(path)
+
+    @classmethod
+    def pop_pending(cls):
+        pending = cls.pending
+        cls.pending = []
+        return pending
+
+    @classmethod
+    def run(cls, jobs=1):
+        """Compresses the queued files, returns the number compressed """
+        pending = sorted(set(cls.pop_pending()))
+        if not pending:
+            return 0
+        if jobs < 1:
+            jobs = multiprocessing.cpu_count()
+        if jobs == 1 or len(pending) == 1:
+            for path in pending:
+                _compress(path)
+        else:
+            pool = multiprocessing.Pool(jobs)
+            try:
+                for path in pool.imap_unordered(_compress, pending, 16):
+                    pass
+            finally:
+                pool.close()
+                pool.join()
+        return len(pending)
+
+def remove_siblings(path):
+    """Removes the compressed siblings of path """
+    for suffix in (".gz", ".br"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
@@ -0,0 +1,72 @@
+import hashlib
+from collections import Mapping, OrderedDict
+
+class FrozenDict(Mapping):
+    """Read-only mapping, keeps the order of the mapping it is made from """
+
+    def __init__(self, data=()):
+        self._data = OrderedDict(data)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "FrozenDict(%r)" % self._data.items()
+
+def freeze(value):
+    """Returns nested dicts and lists as FrozenDicts and tuples """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.iteritems())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class SiteContext(object):
+    """
+    The whole site as templates see it, as the site global: posts (newest
+    first) and pages, the archive tree ({year: {month: {day: posts}}}),
+    counts and settings. Built once per build after parsing and shared by
+    every render; it can't be changed by templates. digest changes
+    whenever the content does, use it in fragment cache keys.
+    """
+
+    def __init__(self, pages=(), posts=(), settings=None, digests=None):
+        # hooks imports generator, which imports this module
+        from racconto.hooks import build_date_index
+        self.pages = tuple(pages)
+        self.posts = tuple(posts)
+        self.archive = freeze(build_date_index(self.posts))
+        years = OrderedDict()
+        for post in self.posts:
+            year = str(post.date.year)
+            years[year] = years.get(year, 0) + 1
+        self.counts = FrozenDict([("posts", len(self.posts)),
+                                  ("pages", len(self.pages)),
+                                  ("years", FrozenDict(years)),
+                                  ])
+        self.settings = freeze(settings or {})
+        self.digest = self._digest(digests or {})
+
+    def recent_posts(self, count=5):
+        """Returns the count latest posts """
+        return self.posts[:count]
+
+    def _digest(self, digests):
+        """Digest of the content and its order. digests are the digests
+        of the sources by path, content without one is described by its
+        title and date.
+        """
+        h = hashlib.sha1()
+        for kind, content in (("page", self.pages), ("post", self.posts)):
+            for content_object in content:
+                digest = digests.get(content_object.source)
+                if digest is None:
+                    digest = repr((content_object.title, getattr(content_object, "date", None)))
+                h.update("%s\0%s\0%s\0" % (kind, content_object.source, digest))
+        return h.hexdigest()
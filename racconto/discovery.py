@@ -0,0 +1,71 @@
+import fnmatch
+import os
+import re
+import stat
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        # Backport, pip install scandir
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from racconto.profiler import Profiler
+
+def compile_ignore_patterns(patterns):
+    """Compiles shell style patterns (drafts/*, *~) into one regular
+    expression, or returns None if there are none
+    """
+    if not patterns:
+        return None
+    return re.compile("|".join("(?:%s)" % fnmatch.translate(pattern) for pattern in patterns))
+
+def discover(directory, extensions=(".md",), ignore_patterns=()):
+    """
+    Walks directory recursively and yields (path, stat) for each file
+    ending with one of extensions, as the walk gets to it. Paths have the
+    './directory/file' form glob returns them in. Hidden files and files
+    or directories whose name or path relative to directory matches one of
+    ignore_patterns are skipped. Each directory is listed sorted.
+    """
+    ignore = compile_ignore_patterns(ignore_patterns)
+    extensions = tuple(extensions)
+    pending = [("./%s" % directory, "")]
+    while pending:
+        path, relative = pending.pop()
+        with Profiler.timer("discovery"):
+            entries = sorted(_list(path))
+        subdirectories = []
+        for name, entry_path, entry_stat in entries:
+            if name.startswith("."):
+                continue
+            entry_relative = relative + name
+            if ignore is not None and (ignore.match(name) or ignore.match(entry_relative)):
+                continue
+            if stat.S_ISDIR(entry_stat.st_mode):
+                subdirectories.append((entry_path, entry_relative + "/"))
+            elif name.endswith(extensions):
+                yield entry_path, entry_stat
+        # Depth first, in sorted order
+        pending.extend(reversed(subdirectories))
+
+def _list(path):
+    """Returns (name, path, stat) of the entries of directory path """
+    if scandir is not None:
+        entries = []
+        for entry in scandir(path):
+            try:
+                entries.append((entry.name, entry.path, entry.stat()))
+            except OSError:
+                pass # Removed while listing
+        return entries
+    entries = []
+    for name in os.listdir(path):
+        entry_path = "%s/%s" % (path, name)
+        try:
+            entries.append((name, entry_path, os.stat(entry_path)))
+        except OSError:
+            pass
+    return entries
@@ -0,0 +1,73 @@
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+#
+# Generators of XML documents, yielded in chunks so large documents
+# are written as they are produced
+#
+
+def to_datetime(value):
+    """Returns a datetime, or a timestamp, as a datetime """
+    if isinstance(value, datetime):
+        return value
+    return datetime.utcfromtimestamp(value)
+
+def w3c_datetime(value):
+    """Formats a datetime, or a timestamp, as 2013-12-11T08:00:00Z """
+    return to_datetime(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def atom_feed(title, url, feed_url, author, entries):
+    """
+    Yields an Atom feed. entries are dicts with title, url, published,
+    updated (datetimes or timestamps) and html. Titles and the author
+    may be numbers, as front matter like "title: 1984" is loaded.
+    """
+    entries = list(entries)
+    updated = max([to_datetime(entry["updated"]) for entry in entries] or [to_datetime(0)])
+    yield (u'<?xml version="1.0" encoding="utf-8"?>\n'
+           u'<feed xmlns="http://www.w3.org/2005/Atom">\n'
+           u'<title>%s</title>\n'
+           u'<link href=%s/>\n'
+           u'<link rel="self" href=%s/>\n'
+           u'<id>%s</id>\n'
+           u'<updated>%s</updated>\n'
+           u'<author><name>%s</name></author>\n') % (
+        escape(unicode(title)), quoteattr(url), quoteattr(feed_url), escape(url),
+        w3c_datetime(updated), escape(unicode(author)))
+    for entry in entries:
+        yield (u'<entry>\n'
+               u'<title>%s</title>\n'
+               u'<link href=%s/>\n'
+               u'<id>%s</id>\n'
+               u'<published>%s</published>\n'
+               u'<updated>%s</updated>\n'
+               u'<content type="html">%s</content>\n'
+               u'</entry>\n') % (
+            escape(unicode(entry["title"])), quoteattr(entry["url"]), escape(entry["url"]),
+            w3c_datetime(entry["published"]), w3c_datetime(entry["updated"]),
+            escape(entry["html"]))
+    yield u'</feed>\n'
+
+def sitemap(urls):
+    """Yields a sitemap of (url, lastmod) pairs, lastmod may be None """
+    yield (u'<?xml version="1.0" encoding="utf-8"?>\n'
+           u'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for url, lastmod in urls:
+        if lastmod is None:
+            yield u'<url><loc>%s</loc></url>\n' % escape(url)
+        else:
+            yield u'<url><loc>%s</loc><lastmod>%s</lastmod></url>\n' % (
+                escape(url), w3c_datetime(lastmod))
+    yield u'</urlset>\n'
+
+def sitemap_index(sitemaps):
+    """Yields an index of (sitemap url, lastmod) pairs """
+    yield (u'<?xml version="1.0" encoding="utf-8"?>\n'
+           u'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for url, lastmod in sitemaps:
+        if lastmod is None:
+            yield u'<sitemap><loc>%s</loc></sitemap>\n' % escape(url)
+        else:
+            yield u'<sitemap><loc>%s</loc><lastmod>%s</lastmod></sitemap>\n' % (
+                escape(url), w3c_datetime(lastmod))
+    yield u'</sitemapindex>\n'
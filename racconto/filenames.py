@@ -0,0 +1,89 @@
+import re
+from datetime import datetime
+
+from racconto.settings_manager import SettingsManager as SETTINGS
+
+# Pattern tokens and the regular expressions they match
+TOKENS = {
+    "YYYY": r"(?P<year>\d{4})",
+    "MM": r"(?P<month>0[1-9]|1[0-2])",
+    "DD": r"(?P<day>0[1-9]|[12]\d|3[01])",
+    "slug": r"(?P<slug>[^/.]+)",
+    }
+
+_token_re = re.compile("|".join(sorted(TOKENS, key=len, reverse=True)))
+
+DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+class FilenameClassifier(object):
+    """
+    Tells posts from pages by their source path, in a single regular
+    expression match per path. A path is a post if its end matches one
+    of the patterns, e.g. YYYY-MM-DD-slug (2013-12-11-a-post.md) or
+    YYYY/MM/slug (2013/12/a-post.md), where the day defaults to 1.
+    Anything after the first dot of the slug (.md) is ignored.
+    Results are cached by path.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self.regex = re.compile("|".join("(?:%s)" % self._translate(pattern, index)
+                                         for index, pattern in enumerate(self.patterns)))
+        self.cache = {}
+
+    def classify(self, filepath):
+        """Returns (kind, date, slug) for filepath. kind is "post" or
+        "page", date is None for pages.
+        """
+        result = self.cache.get(filepath)
+        if result is None:
+            result = self.cache[filepath] = self._classify(filepath)
+        return result
+
+    def _classify(self, filepath):
+        match = self.regex.search(filepath)
+        if match is not None:
+            groups = match.groupdict()
+            # Only the groups of the pattern which matched are set
+            index = match.lastgroup.rsplit("_", 1)[1]
+            year = int(groups["year_" + index])
+            month = int(groups.get("month_" + index) or 1)
+            day = int(groups.get("day_" + index) or 1)
+            if day <= 28 or (day <= DAYS_IN_MONTH[month] and (month != 2 or is_leap(year))):
+                return "post", datetime(year, month, day), groups["slug_" + index]
+        name = filepath[filepath.rfind("/") + 1:]
+        return "page", None, name.split(".", 1)[0]
+
+    @staticmethod
+    def _translate(pattern, index):
+        """Returns the regular expression of a pattern, with the group
+        names suffixed by the index of the pattern
+        """
+        parts = []
+        position = 0
+        tokens = set()
+        for match in _token_re.finditer(pattern):
+            parts.append(re.escape(pattern[position:match.start()]))
+            parts.append(TOKENS[match.group()].replace(">", "_%d>" % index, 1))
+            tokens.add(match.group())
+            position = match.end()
+        parts.append(re.escape(pattern[position:]))
+        if "YYYY" not in tokens or "slug" not in tokens:
+            raise ValueError("Filename pattern %r must contain YYYY and slug" % pattern)
+        # The slug group must close last, match.lastgroup names it
+        if not pattern.endswith("slug"):
+            raise ValueError("Filename pattern %r must end with slug" % pattern)
+        return r"(?:^|/)%s(?:\.[^/]*)?$" % "".join(parts)
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+_classifiers = {}
+
+def classify(filepath):
+    """Classifies filepath with the POST_FILENAME_PATTERNS setting """
+    patterns = tuple(SETTINGS.get('POST_FILENAME_PATTERNS'))
+    classifier = _classifiers.get(patterns)
+    if classifier is None:
+        classifier = _classifiers[patterns] = FilenameClassifier(patterns)
+    return classifier.classify(filepath)
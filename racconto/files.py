@@ -0,0 +1,43 @@
+import os
+from contextlib import contextmanager
+
+#
+# Writing files other build processes, the dev server or the web server
+# may read or write at the same time
+#
+
+def makedirs(path):
+    """Creates path unless it exists. Tolerates other build
+    processes creating the same directories concurrently.
+    """
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+def temporary_path(path):
+    """Returns the path new content of path is written to before it is
+    renamed to path, distinct for each build process
+    """
+    return "%s.%d.tmp" % (path, os.getpid())
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """Yields a file to write the content of path to, which replaces
+    path once written, readers never see it partly written. Creates the
+    directory of path if needed. Nothing is replaced if writing fails.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        makedirs(directory)
+    tmp_path = temporary_path(path)
+    f = open(tmp_path, mode)
+    try:
+        yield f
+    except:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    f.close()
+    os.rename(tmp_path, path)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+from numbers import Number
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from jinja2.runtime import Undefined
+from markupsafe import Markup
+
+from racconto.assets import AssetManifest
+from racconto.cache import DiskCache
+
+def describe(value):
+    """Returns a stable description of a fragment cache input: strings,
+    numbers, None, sequences of them, or objects with a digest (an
+    attribute or a method, e.g. site.digest or a taxonomy).
+    """
+    if value is None or isinstance(value, (bool, Number)):
+        return repr(value)
+    if isinstance(value, unicode):
+        return "s%r" % value.encode('utf-8')
+    if isinstance(value, str):
+        return "s%r" % value
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % ",".join(describe(item) for item in value)
+    if isinstance(value, Undefined):
+        return "undefined"
+    digest = getattr(value, "digest", None)
+    if hasattr(digest, '__call__'):
+        digest = digest()
+    if isinstance(digest, basestring):
+        return "d%r" % str(digest)
+    raise TypeError("Can't use %r in a fragment cache key, use strings, "
+                    "numbers or objects with a digest" % (value,))
+
+class FragmentCache(DiskCache):
+    """
+    Cache of template fragments rendered by {% cache %}. Fragments are
+    kept in memory for the build and, once setup with a directory, on
+    disk between builds. Keys cover the declared inputs, the sources of
+    the template the fragment is in and of the templates it uses, and
+    the signature of the build's settings. A fragment is rendered again
+    when assets it links to with asset_url got another fingerprint.
+    """
+
+    directory = None
+    max_size = None
+    # key -> (rendered fragment, assets it used), for the current build
+    fragments = {}
+    # Settings signature of the current build
+    signature = ""
+    # Hits in memory or on disk and fragments rendered
+    stats = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def start(cls, signature="", template_digest=None):
+        """Forgets the fragments of the previous build. template_digest
+        returns the digest of a template name and of the templates it uses.
+        """
+        cls.fragments = {}
+        cls.signature = signature
+        cls.template_digest = staticmethod(template_digest or (lambda name: ""))
+
+    @staticmethod
+    def template_digest(name):
+        return ""
+
+    @classmethod
+    def key(cls, name, number, inputs):
+        """Returns the key of the number:th fragment of template name """
+        h = hashlib.sha1()
+        h.update("%s\0%s\0%s\0%d\0" % (cls.signature, cls.template_digest(name), name, number))
+        for value in inputs:
+            h.update(describe(value))
+            h.update("\0")
+        return h.hexdigest()
+
+    @classmethod
+    def fetch(cls, key, render):
+        """Returns the fragment of key, rendered with render() unless cached.
+        The assets it used count as used by the template it is in.
+        """
+        cached = cls.fragments.get(key)
+        if cached is None and cls.directory is not None:
+            cached = cls._load(key)
+        if cached is not None and AssetManifest.changed(cached[1]):
+            cached = None
+        if cached is None:
+            cls.stats["misses"] += 1
+            outer = AssetManifest.pop_used()
+            try:
+                fragment = unicode(render())
+            finally:
+                assets = AssetManifest.pop_used()
+                AssetManifest.use(outer)
+            cached = (fragment, assets)
+            if cls.directory is not None:
+                # The assets on the first line
+                cls.set(key, u"%s\n%s" % (json.dumps(assets), fragment))
+        else:
+            cls.stats["hits"] += 1
+        AssetManifest.use(cached[1])
+        cls.fragments[key] = cached
+        return cached[0]
+
+    @classmethod
+    def _load(cls, key):
+        data = cls.get(key)
+        if data is None:
+            return None
+        assets, fragment = data.split(u"\n", 1)
+        return fragment, json.loads(assets)
+
+    @classmethod
+    def pop_stats(cls):
+        """Returns the hit and miss counts and resets them """
+        stats = cls.stats
+        cls.stats = {"hits": 0, "misses": 0}
+        return stats
+
+    @classmethod
+    def add_stats(cls, stats):
+        """Adds counts from another build process """
+        for key in stats:
+            cls.stats[key] += stats[key]
+
+    @staticmethod
+    def hit_rate(stats):
+        """Returns the percentage of fragments found in the cache """
+        total = stats["hits"] + stats["misses"]
+        if not total:
+            return 0.0
+        return stats["hits"] * 100.0 / total
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache "sidebar", site.digest %}...{% endcache %} renders its body
+    once for each distinct value of the inputs listed in the tag, later
+    renders reuse it. The body must only depend on the inputs.
+    """
+
+    tags = set(["cache"])
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # Fragments are told apart by their order in the template
+        number = parser.fragment_count = getattr(parser, "fragment_count", 0) + 1
+        inputs = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            inputs.append(parser.parse_expression())
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        arguments = [nodes.Const(parser.name), nodes.Const(number), nodes.List(inputs)]
+        return nodes.CallBlock(self.call_method("_render", arguments),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, name, number, inputs, caller):
+        key = FragmentCache.key(name, number, inputs)
+        # Already rendered output, not to be escaped again
+        return Markup(FragmentCache.fetch(key, caller))
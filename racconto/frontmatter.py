@@ -0,0 +1,76 @@
+import copy
+import re
+
+import yaml
+
+# libyaml if PyYAML was built with it
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# key: value lines the fast path handles, anything else is left to yaml
+_line_re = re.compile(r"^([A-Za-z_][A-Za-z0-9_-]*):[ ]+(\S.*?)[ ]*$")
+_int_re = re.compile(r"^(?:0|-?[1-9][0-9]*)$")
+# Plain scalars yaml resolves to something else than a string
+_reserved = set(["yes", "no", "true", "false", "on", "off", "null", "y", "n"])
+
+class FrontMatter(object):
+    """
+    Parses YAML front matter with the safe loader, in C if available.
+    Flat front matter of plain 'key: value' lines (strings and integers)
+    is parsed without yaml, with the same result. Parsed front matter is
+    cached by content, each caller gets a copy it may change.
+    """
+
+    MAX_CACHED = 10000
+
+    # text -> (config, flat)
+    cache = {}
+
+    @classmethod
+    def load(cls, text):
+        cached = cls.cache.get(text)
+        if cached is None:
+            config = cls._load_flat(text)
+            flat = config is not None
+            if not flat:
+                config = yaml.load(text, Loader=SafeLoader)
+            if len(cls.cache) >= cls.MAX_CACHED:
+                cls.cache.clear()
+            cached = cls.cache[text] = (config, flat)
+        config, flat = cached
+        if flat:
+            return dict(config)
+        return copy.deepcopy(config)
+
+    @classmethod
+    def _load_flat(cls, text):
+        """Returns the front matter as a dict if it is flat,
+        otherwise None
+        """
+        config = {}
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            match = _line_re.match(line)
+            if match is None:
+                return None
+            key, value = match.groups()
+            if key.lower() in _reserved:
+                return None
+            if _int_re.match(value):
+                config[_str(key)] = int(value)
+            elif (value[0].isalpha() and value[0] < u"\x80" and value.lower() not in _reserved
+                  and ": " not in value and " #" not in value and "\t" not in value
+                  and not value.endswith(":")):
+                config[_str(key)] = _str(value)
+            else:
+                return None
+        if not config:
+            return None
+        return config
+
+def _str(value):
+    """Returns value as str if it is ascii, as yaml does on python 2 """
+    try:
+        return value.encode('ascii')
+    except UnicodeError:
+        return value
@@ -1,20 +1,123 @@
-import os
 import codecs
+import filecmp
+import os
+import shutil
+import uuid
 import distutils
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
+from jinja2.exceptions import TemplateNotFound
+from jinja2.loaders import split_template_path
+from markupsafe import Markup
 
+from racconto.assets import AssetManifest
+from racconto.compress import Compressor
+from racconto.context import SiteContext
+from racconto.files import atomic_write, makedirs, temporary_path
+from racconto.fragments import FragmentCacheExtension
+from racconto.parsers import RaccontoParser
+from racconto.profiler import Profiler
 from racconto.settings_manager import SettingsManager as SETTINGS
 
+class PrecompiledLoader(FileSystemLoader):
+    """
+    Loads templates precompiled by Generator.compile_templates from
+    compiled_path, unless their source was modified after they were
+    compiled, and otherwise from the source.
+    """
+
+    def __init__(self, searchpath, compiled_path=None):
+        FileSystemLoader.__init__(self, searchpath)
+        self.compiled = None
+        if compiled_path:
+            try:
+                self.compiled_at = os.path.getmtime(os.path.join(compiled_path,
+                                                                 COMPILED_MARKER))
+                self.compiled = ModuleLoader(compiled_path)
+            except OSError:
+                pass # Not compiled
+
+    def load(self, environment, name, globals=None):
+        if self.compiled is not None and self._compiled_is_fresh(name):
+            try:
+                return self.compiled.load(environment, name, globals)
+            except TemplateNotFound:
+                pass
+        return FileSystemLoader.load(self, environment, name, globals)
+
+    def _compiled_is_fresh(self, name):
+        pieces = split_template_path(name)
+        for searchpath in self.searchpath:
+            try:
+                return os.path.getmtime(os.path.join(searchpath, *pieces)) <= self.compiled_at
+            except OSError:
+                continue
+        return False
+
+# Written when templates are compiled, its mtime tells when that was
+COMPILED_MARKER = ".compiled"
+
 class Generator:
 
     jinja_env = None
+    # Manifest of the current build, used to skip index files whose
+    # content hasn't changed
+    manifest = None
+    # Number of files written and of files left untouched since
+    # they already had the generated content
+    stats = {"written": 0, "skipped": 0}
+    # Digests of the template globals set with set_global, by name
+    global_digests = {}
 
     @classmethod
-    def setup_jinja_environment(cls, templates_path):
+    def setup_jinja_environment(cls, templates_path, bytecode_cache_path=None, compiled_path=None):
         """Load save the jinja2 environment
+        bytecode_cache_path - optional directory where compiled templates are
+        cached between builds
+        compiled_path - optional directory of templates precompiled with
+        compile_templates
+        Loaded templates are kept in memory and not checked for changes,
+        call reload_templates when they have changed.
+        """
+        bytecode_cache = None
+        if bytecode_cache_path:
+            makedirs(bytecode_cache_path)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_path)
+        cls.jinja_env = Environment(loader=PrecompiledLoader(templates_path, compiled_path),
+                                    bytecode_cache=bytecode_cache,
+                                    auto_reload=False,
+                                    cache_size=-1,
+                                    extensions=[FragmentCacheExtension])
+        # Replaced by the site's content once it is parsed
+        cls.jinja_env.globals["site"] = SiteContext(settings=SETTINGS.settings)
+
+    @classmethod
+    def set_global(cls, name, value, digest):
+        """Makes value available to every template as name. digest must
+        change whenever value changes, content rendered with templates
+        using name is rendered again when it does.
         """
-        cls.jinja_env = Environment(loader=FileSystemLoader(templates_path))
+        cls.jinja_env.globals[name] = value
+        cls.global_digests[name] = digest
+
+    @classmethod
+    def reload_templates(cls):
+        """Forgets loaded templates, they're loaded again when used """
+        cls.jinja_env.cache.clear()
+
+    @classmethod
+    def compile_templates(cls, compiled_path):
+        """Compiles all templates to python modules in compiled_path.
+        Returns the number of templates compiled.
+        """
+        if os.path.isdir(compiled_path):
+            shutil.rmtree(compiled_path)
+        makedirs(compiled_path)
+        names = []
+        cls.jinja_env.compile_templates(compiled_path, zip=None, ignore_errors=False,
+                                        log_function=names.append)
+        open(os.path.join(compiled_path, COMPILED_MARKER), 'w').close()
+        return len([name for name in names if name.startswith("Compiled ")])
 
     @classmethod
     def generate(cls, content_object, directory):
@@ -23,27 +126,168 @@ class Generator:
         content_object - instance of Post or Page
         directory - name of directory to save generated file
         """
-        template = cls.jinja_env.get_template(content_object.template)
-        output = template.render(content_object.template_parameters)
-        # Create the directories if they don't exist already
-        path = "%s/%s" % (directory, content_object.filepath)
-        if not os.path.exists(path):
-            os.makedirs(path)
+        with Profiler.timer("generate"):
+            template = cls.jinja_env.get_template(content_object.template)
+            # Create the directories if they don't exist already
+            path = "%s/%s" % (directory, content_object.filepath)
+            makedirs(path)
 
-        full_path = "%s/%s" % (path, 'index.html')
-        f = codecs.open(full_path, 'w+', 'utf-8')
-        f.write(output)
-        f.close()
+            full_path = cls.output_path(content_object, directory)
+            if content_object.streams_body():
+                cls._generate_streamed(content_object, template, full_path)
+                return full_path
+            # The body is converted before rendering, timed as markdown,
+            # so the render time of templates doesn't include it
+            with Profiler.timer(None, content_object.source):
+                content_object.body
+                context = content_object.template_context()
+            with Profiler.timer("render", content_object.source, content_object.template):
+                output = template.render(context)
+            with Profiler.timer("write", content_object.source):
+                cls.write(full_path, output)
+        return full_path
+
+    @classmethod
+    def _generate_streamed(cls, content_object, template, full_path):
+        """Generates the file of content_object too large to keep in
+        memory: its body is converted to a temporary file, the template
+        is rendered with a placeholder for the body, which is replaced
+        with the temporary file's content as the output is written.
+        Templates can only output such a body as is.
+        """
+        # Converting the body is timed as markdown
+        with Profiler.timer(None, content_object.source):
+            body_path = RaccontoParser().spill_body(content_object.source,
+                                                    SETTINGS.get('LARGE_FILE_SPILL_DIR'))
+        try:
+            placeholder = u"\0racconto-body-%s\0" % uuid.uuid4().hex
+            context = content_object.template_context(body=Markup(placeholder))
+            chunks = template.generate(context)
+            # Rendering and writing are interleaved
+            with Profiler.timer("render", content_object.source, content_object.template):
+                cls.write_stream(full_path, cls._splice(chunks, placeholder, body_path))
+        finally:
+            os.remove(body_path)
+
+    @staticmethod
+    def _splice(chunks, placeholder, body_path, size=64 * 1024):
+        """Yields chunks, with the content of the file at body_path,
+        read size characters at a time, in place of placeholder
+        """
+        for chunk in chunks:
+            if placeholder not in chunk:
+                yield chunk
+                continue
+            pieces = chunk.split(placeholder)
+            for i, piece in enumerate(pieces):
+                if i:
+                    f = codecs.open(body_path, 'r', 'utf-8')
+                    try:
+                        for body_chunk in iter(lambda: f.read(size), u""):
+                            yield body_chunk
+                    finally:
+                        f.close()
+                if piece:
+                    yield piece
 
     @classmethod
-    def generate_index_file(cls, directory_path, template_name, **template_arguments):
+    def output_path(cls, content_object, directory):
+        """Returns the path of the file generated from content_object """
+        return "%s/%s/%s" % (directory, content_object.filepath, 'index.html')
+
+    @classmethod
+    def generate_index_file(cls, directory_path, template_name, depends_on=None, **template_arguments):
         """
         Generates a index.html with template (rendered with template_arguments)
         inside directory_path.
+        depends_on - optional list of the posts and pages shown in the file.
+        If given, the file is only rendered if they, their order, the template
+        or the plain template arguments changed since the previous build.
         """
-        template = cls.jinja_env.get_template(template_name)
         path = "%s/%s" % (directory_path, "index.html")
-        if not os.path.exists(directory_path):
-            os.makedirs(directory_path)
-        f = codecs.open(path, 'w+', 'utf-8')
-        f.write(template.render(**template_arguments))
+        if depends_on is not None and cls.manifest is not None:
+            if not cls.manifest.index_file_changed(path, cls.jinja_env, template_name,
+                                                   depends_on, template_arguments):
+                cls.stats["skipped"] += 1
+                return
+        template = cls.jinja_env.get_template(template_name)
+        makedirs(directory_path)
+        AssetManifest.pop_used()
+        with Profiler.timer("render", template=template_name):
+            output = template.render(**template_arguments)
+        if cls.manifest is not None:
+            cls.manifest.index_file_assets(path, AssetManifest.pop_used())
+        with Profiler.timer("write"):
+            cls.write(path, output)
+
+    @classmethod
+    def write(cls, path, output):
+        """Writes output to path unless the file already has exactly that
+        content, which leaves its mtime alone for tools syncing the site.
+        Files are replaced atomically through a temporary file.
+        Returns True if the file was written.
+        """
+        data = output.encode('utf-8')
+        try:
+            unchanged = os.path.getsize(path) == len(data) and cls._read(path) == data
+        except (IOError, OSError):
+            unchanged = False
+        if unchanged:
+            cls.stats["skipped"] += 1
+            Compressor.queue(path, False)
+            return False
+
+        with atomic_write(path) as f:
+            f.write(data)
+        cls.stats["written"] += 1
+        Compressor.queue(path)
+        return True
+
+    @classmethod
+    def write_stream(cls, path, chunks):
+        """Writes the unicode chunks to path as they are produced, for
+        files too large to build as one string. Like write, the file is
+        left alone if its content didn't change. Returns True if the
+        file was written.
+        """
+        makedirs(os.path.dirname(path))
+        tmp_path = temporary_path(path)
+        f = open(tmp_path, 'wb')
+        try:
+            for chunk in chunks:
+                f.write(chunk.encode('utf-8'))
+        except:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.close()
+        if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
+            cls.stats["skipped"] += 1
+            Compressor.queue(path, False)
+            return False
+        os.rename(tmp_path, path)
+        cls.stats["written"] += 1
+        Compressor.queue(path)
+        return True
+
+    @classmethod
+    def pop_stats(cls):
+        """Returns the write stats and resets them """
+        stats = cls.stats
+        cls.stats = {"written": 0, "skipped": 0}
+        return stats
+
+    @classmethod
+    def add_stats(cls, stats):
+        """Adds write stats from another build process """
+        for key in stats:
+            cls.stats[key] += stats[key]
+
+    @staticmethod
+    def _read(path):
+        f = open(path, 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
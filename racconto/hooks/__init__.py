@@ -1,73 +1,338 @@
+from collections import OrderedDict
 from datetime import datetime as d
-from distutils.dir_util import copy_tree
+import hashlib
+from itertools import islice
 import os
 
+from racconto.assets import AssetManifest, asset_manifest_path
+from racconto.compress import Compressor
+from racconto.feeds import atom_feed, sitemap, sitemap_index
 from racconto.generator import Generator
+from racconto.hooks.manager import HooksManager, aggregate
 from racconto.settings_manager import SettingsManager as SETTINGS
+from racconto.static import StaticSync
+from racconto.taxonomy import Taxonomy
 
+def build_date_index(posts):
+    """
+    Groups posts by date in a single pass.
+    Returns nested dicts {year: {month: {day: [list, of, posts] } } in the
+    order of posts, keys are zero padded strings ("2013", "01", "01").
+    """
+    archive = OrderedDict()
+    current = None
+    for post in posts:
+        date = post.date
+        if current is None or (date.day != current.day or
+                               date.month != current.month or
+                               date.year != current.year):
+            # Format keys once per day rather than once per post
+            current = date
+            year = archive.setdefault(str(date.year), OrderedDict())
+            month = year.setdefault("%02d" % date.month, OrderedDict())
+            day_posts = month.setdefault("%02d" % date.day, [])
+        day_posts.append(post)
+    return archive
+
+def paginate(items, page_size, path, url, anchored=False):
+    """
+    Splits items into pages of page_size items (one page if page_size is None).
+    Yields (directory, template arguments) for each page, the first page in
+    path and following pages in path/page/<number>. url is the URL of path.
+    With anchored, items being newest first, pages are counted from the last
+    item so only the first pages change when items are added, see
+    _anchored_pages.
+    """
+    if page_size:
+        pages = max(1, (len(items) + page_size - 1) // page_size)
+    else:
+        pages, page_size = 1, max(1, len(items))
+    if anchored:
+        for page in _anchored_pages(items, page_size, pages, path, url):
+            yield page
+        return
+
+    def page_url(number):
+        if number == 1:
+            return url
+        return "%spage/%d/" % (url, number)
+
+    for number in range(1, pages + 1):
+        directory = path if number == 1 else "%s/page/%d" % (path, number)
+        yield directory, {"post_list": items[(number - 1) * page_size:number * page_size],
+                          "page": number,
+                          "pages": pages,
+                          "previous_url": page_url(number - 1) if number > 1 else None,
+                          "next_url": page_url(number + 1) if number < pages else None,
+                          }
+
+def _anchored_pages(items, page_size, pages, path, url):
+    """
+    Pages numbered from the oldest: page 1 has the page_size oldest items,
+    page 2 the next ones and so on. The first page, in path, has the
+    page_size newest items, which may include some of the page before it.
+    The other pages are in path/page/<number> and keep their items and
+    number when items are added: only the first page changes, and when
+    the newest page was full, it gets its own page and the one before it
+    is changed to link to that. The arguments don't include the number
+    of pages, which would change them all.
+    """
+    def page_url(number):
+        if number == pages:
+            return url
+        return "%spage/%d/" % (url, number)
+
+    for number in range(pages, 0, -1):
+        if number == pages:
+            directory, post_list = path, items[:page_size]
+        else:
+            end = len(items) - (number - 1) * page_size
+            directory, post_list = "%s/page/%d" % (path, number), items[end - page_size:end]
+        yield directory, {"post_list": post_list,
+                          "page": number,
+                          "previous_url": page_url(number + 1) if number < pages else None,
+                          "next_url": page_url(number - 1) if number > 1 else None,
+                          }
+
+def site_url(path):
+    """Returns the URL of a directory in SITEDIR """
+    relative = os.path.relpath(path, SETTINGS.get('SITEDIR'))
+    if relative == os.curdir:
+        return "/"
+    return "/%s/" % relative.replace(os.sep, "/")
+
+@aggregate
 def generate_archive(pages, posts):
     """
     Generate archive from posts. Assumes posts have been generated (i.e directories)
     posts - a sorted list of Post objects
+    Archive pages are only regenerated if their posts changed. Year and month
+    archives are paginated when ARCHIVE_PAGE_SIZE is set.
     """
-    # Dict with nested dicts: {year: {month: {day: [list, of, posts] } }
-    archive = {}
-    for post in posts:
-        timestamp = post.date.isoformat()
-        year = post.date.strftime("%Y")
-        month = post.date.strftime("%m")
-        day = post.date.strftime("%d")
-
-        # Setup data structures
-        if year not in archive:
-            archive[year] = {}
-        if month not in archive[year]:
-            archive[year][month] = {}
-        if day not in archive[year][month]:
-            archive[year][month][day] = []
-        # Populate with post
-        archive[year][month][day].append(post)
+    archive = build_date_index(posts)
 
     year_template = SETTINGS.get("YEAR_TEMPLATE")
     month_template = SETTINGS.get("MONTH_TEMPLATE")
     day_template = SETTINGS.get("DAY_TEMPLATE")
+    page_size = SETTINGS.get("ARCHIVE_PAGE_SIZE")
 
     BLOGDIR = SETTINGS.get('BLOGDIR')
     for year in archive:
         path = "%s/%s" % (BLOGDIR, year)
-        Generator.generate_index_file(path, year_template, **{"post_dict": archive[year], "year": year})
+        year_posts = [post for days in archive[year].itervalues()
+                           for day_posts in days.itervalues()
+                           for post in day_posts]
+        for directory, arguments in paginate(year_posts, page_size, path, site_url(path)):
+            post_dict = archive[year]
+            if arguments["pages"] > 1:
+                post_dict = build_date_index(arguments["post_list"])[year]
+            Generator.generate_index_file(directory, year_template, arguments["post_list"],
+                                          post_dict=post_dict, year=year, **arguments)
         for month in archive[year]:
             path = "%s/%s/%s" % (BLOGDIR, year, month)
-            Generator.generate_index_file(path, month_template, **{"post_dict": archive[year][month], "year": year, "month": month})
+            month_posts = [post for day_posts in archive[year][month].itervalues()
+                                for post in day_posts]
+            for directory, arguments in paginate(month_posts, page_size, path, site_url(path)):
+                post_dict = archive[year][month]
+                if arguments["pages"] > 1:
+                    post_dict = build_date_index(arguments["post_list"])[year][month]
+                Generator.generate_index_file(directory, month_template, arguments["post_list"],
+                                              post_dict=post_dict, year=year, month=month,
+                                              **arguments)
             for day in archive[year][month]:
                 path = "%s/%s/%s/%s" % (BLOGDIR, year, month, day)
-                Generator.generate_index_file(path, day_template, **{"post_list": archive[year][month][day], "year": year, "month": month, "day": day})
+                day_posts = archive[year][month][day]
+                Generator.generate_index_file(path, day_template, day_posts,
+                                              post_list=day_posts, year=year, month=month, day=day)
 
 def copy_static_files(*args):
-    """Copy static files and move favicon and apple-touch-icon to site root
+    """Sync static files to SITEDIR/STATICDIR. Only new and changed files are
+    copied and files removed from STATICDIR are removed. Files listed in
+    STATIC_ROOT_FILES (favicon.ico, apple-touch-icon.png) go to the site root.
+    With FINGERPRINT_STATIC every other file is also written with a
+    fingerprinted name, see racconto.assets.
     """
-    TEMPLATEDIR = SETTINGS.get('TEMPLATEDIR')
     STATICDIR = SETTINGS.get('STATICDIR')
     SITEDIR = SETTINGS.get('SITEDIR')
     static_site = "%s/%s" % (SITEDIR, STATICDIR)
 
-    copy_tree(STATICDIR, static_site)
-    try:
-        os.rename("%s/favicon.ico" % static_site, "%s/favicon.ico" % SITEDIR)
-        os.rename("%s/apple-touch-icon.png" % static_site,
-                  "%s/apple-touch-icon.png" % SITEDIR)
-    except OSError, e:
-        print "[Warning] Could not copy favicon and apple-touch-icon."
+    fingerprints, keep = None, ()
+    if SETTINGS.get('FINGERPRINT_STATIC'):
+        fingerprints = AssetManifest.fingerprints()
+        keep = [asset_manifest_path()]
 
-# FIXME consolidate these two methods
+    sync = StaticSync(SETTINGS.get('STATIC_HASHES'), SETTINGS.get('STATIC_HARDLINKS'))
+    synced = sync.sync(STATICDIR, static_site, SETTINGS.get('STATIC_ROOT_FILES'), SITEDIR,
+                       fingerprints, keep, Compressor.suffixes())
+    for path in sorted(synced):
+        if os.path.exists(path):
+            Compressor.queue(path, path in sync.copied)
+    return sync
+
+def _generate_latest_posts_index(directory, template, posts, count):
+    latest = posts[0:count]
+    Generator.generate_index_file(directory, template, latest, **{"post_list": latest})
+
+@aggregate
 def generate_blog_index_file_10(pages, posts):
     """Creates an index file with the 10 latest blog posts
     """
     SITEDIR = SETTINGS.get('SITEDIR')
-    Generator.generate_index_file(SITEDIR, "index.html", **{"post_list": posts[0:10]})
+    _generate_latest_posts_index(SITEDIR, "index.html", posts, 10)
 
+@aggregate
 def generate_blog_index_file(pages, posts):
-    # FIXME make this a bit more flexible
+    """Creates a blog index file with the 5 latest blog posts.
+    See generate_paginated_blog_index for an index of all posts.
+    """
     BLOGDIR = SETTINGS.get('BLOGDIR')
     TEMPLATE = SETTINGS.get('BLOG_INDEX_TEMPLATE')
-    Generator.generate_index_file(BLOGDIR, TEMPLATE, **{"post_list": posts[0:5]})
+    _generate_latest_posts_index(BLOGDIR, TEMPLATE, posts, 5)
+
+@aggregate
+def generate_paginated_blog_index(pages, posts):
+    """
+    Creates a blog index of all posts, BLOG_INDEX_PAGE_SIZE posts per page.
+    BLOGDIR/index.html has the newest posts, the older pages are numbered
+    from the oldest, BLOGDIR/page/1/ has the oldest posts, so they keep
+    their posts as posts are added. The index links to the page with the
+    posts following it, which may repeat some of the index. A new post
+    changes at most the index and the two newest pages, the other pages
+    are not regenerated.
+    Besides post_list the template gets page, previous_url (newer posts)
+    and next_url (older posts).
+    """
+    BLOGDIR = SETTINGS.get('BLOGDIR')
+    TEMPLATE = SETTINGS.get('BLOG_INDEX_TEMPLATE')
+    page_size = SETTINGS.get('BLOG_INDEX_PAGE_SIZE')
+    for directory, arguments in paginate(posts, page_size, BLOGDIR, site_url(BLOGDIR), True):
+        Generator.generate_index_file(directory, TEMPLATE, arguments["post_list"], **arguments)
+
+def build_taxonomies(pages, posts):
+    """
+    Before all hook grouping posts by the terms of each front matter key
+    in TAXONOMIES (e.g. ['tags', 'categories']). The result is available
+    to every template as taxonomies, e.g. taxonomies.tags.most_used(10)
+    for a sidebar; content is rendered again only when it changes.
+    """
+    SITEDIR = SETTINGS.get('SITEDIR')
+    taxonomies = {}
+    h = hashlib.sha1()
+    for key in SETTINGS.get('TAXONOMIES'):
+        taxonomies[key] = Taxonomy(key, posts, site_url("%s/%s" % (SITEDIR, key)))
+        h.update("%s\0%s\0" % (key, taxonomies[key].digest()))
+    Generator.set_global("taxonomies", taxonomies, h.hexdigest())
+    return taxonomies
+
+@aggregate
+def generate_taxonomy_pages(pages, posts):
+    """
+    Creates SITEDIR/<key>/index.html listing the terms of each key in
+    TAXONOMIES, with TAXONOMY_INDEX_TEMPLATE (gets taxonomy), and a page
+    of the posts of each term in SITEDIR/<key>/<term>/, with
+    TAXONOMY_TEMPLATE (gets term, taxonomy and the pagination arguments,
+    TAXONOMY_PAGE_SIZE posts per page). Only the pages of terms whose
+    posts changed are rendered again.
+    Uses the taxonomies of build_taxonomies if it is registered as a
+    before all hook, otherwise builds them.
+    """
+    SITEDIR = SETTINGS.get('SITEDIR')
+    TEMPLATE = SETTINGS.get('TAXONOMY_TEMPLATE')
+    INDEX_TEMPLATE = SETTINGS.get('TAXONOMY_INDEX_TEMPLATE')
+    page_size = SETTINGS.get('TAXONOMY_PAGE_SIZE')
+    if build_taxonomies in HooksManager.before_all_hooks:
+        taxonomies = Generator.jinja_env.globals["taxonomies"]
+    else:
+        # The global may be left from a previous build in this process
+        taxonomies = build_taxonomies(pages, posts)
+    for key in SETTINGS.get('TAXONOMIES'):
+        taxonomy = taxonomies[key]
+        path = "%s/%s" % (SITEDIR, key)
+        # Depends on the terms and their counts, not on the posts
+        Generator.generate_index_file(path, INDEX_TEMPLATE, [], taxonomy=taxonomy,
+                                      key=key, digest=taxonomy.digest())
+        for term in taxonomy:
+            term_path = "%s/%s" % (path, term.slug)
+            for directory, arguments in paginate(term.posts, page_size, term_path, term.url):
+                Generator.generate_index_file(directory, TEMPLATE, arguments["post_list"],
+                                              term=term, taxonomy=taxonomy, key=key,
+                                              name=term.name, **arguments)
+
+def absolute_url(path):
+    """Returns the absolute URL, with SITE_URL, of a directory in SITEDIR """
+    return SETTINGS.get('SITE_URL').rstrip("/") + site_url(path)
+
+def _lastmod(content_object):
+    """Returns the mtime of the source of content_object as of its build """
+    if Generator.manifest is None:
+        return None
+    return Generator.manifest.lastmod(content_object.source)
+
+def _index_file_written(path):
+    if Generator.manifest is not None:
+        Generator.manifest.index_file_written(path)
+
+def _content_urls(pages, posts):
+    """Yields (url, lastmod) of the site root, pages and posts """
+    SITEDIR = SETTINGS.get('SITEDIR')
+    BLOGDIR = SETTINGS.get('BLOGDIR')
+    # The root lists the latest posts
+    yield absolute_url(SITEDIR), _lastmod(posts[0]) if posts else None
+    for page in pages:
+        yield absolute_url("%s/%s" % (SITEDIR, page.filepath)), _lastmod(page)
+    for post in posts:
+        yield absolute_url("%s/%s" % (BLOGDIR, post.filepath)), _lastmod(post)
+
+@aggregate
+def generate_sitemap(pages, posts):
+    """
+    Writes SITEDIR/SITEMAP_FILE with the URLs of the site root, pages and
+    posts, as they are listed. lastmod is the modification time of the
+    source as of its build. Above SITEMAP_MAX_URLS URLs the sitemap is an
+    index of sitemap-1.xml, sitemap-2.xml etc., each with at most that many.
+    """
+    SITEDIR = SETTINGS.get('SITEDIR')
+    path = "%s/%s" % (SITEDIR, SETTINGS.get('SITEMAP_FILE'))
+    max_urls = SETTINGS.get('SITEMAP_MAX_URLS')
+    count = 1 + len(pages) + len(posts)
+    urls = _content_urls(pages, posts)
+    if count <= max_urls:
+        Generator.write_stream(path, sitemap(urls))
+        _index_file_written(path)
+        return
+
+    base, extension = os.path.splitext(path)
+    shards = []
+    for number in range(1, (count - 1) // max_urls + 2):
+        shard_urls = list(islice(urls, max_urls))
+        shard_path = "%s-%d%s" % (base, number, extension)
+        Generator.write_stream(shard_path, sitemap(shard_urls))
+        _index_file_written(shard_path)
+        shards.append((SETTINGS.get('SITE_URL').rstrip("/") + "/" +
+                       os.path.relpath(shard_path, SITEDIR).replace(os.sep, "/"),
+                       max([lastmod for url, lastmod in shard_urls]) or None))
+    Generator.write_stream(path, sitemap_index(shards))
+    _index_file_written(path)
+
+@aggregate
+def generate_feed(pages, posts):
+    """
+    Writes an Atom feed of the FEED_SIZE latest posts to SITEDIR/FEED_FILE,
+    titled SITE_TITLE by SITE_AUTHOR. Post bodies are the HTML the posts
+    were rendered with, from the markdown cache.
+    """
+    SITEDIR = SETTINGS.get('SITEDIR')
+    BLOGDIR = SETTINGS.get('BLOGDIR')
+    path = "%s/%s" % (SITEDIR, SETTINGS.get('FEED_FILE'))
+    entries = []
+    for post in posts[:SETTINGS.get('FEED_SIZE')]:
+        entries.append({"title": post.title,
+                        "url": absolute_url("%s/%s" % (BLOGDIR, post.filepath)),
+                        "published": post.date,
+                        "updated": _lastmod(post) or post.date,
+                        "html": post.body,
+                        })
+    feed_url = SETTINGS.get('SITE_URL').rstrip("/") + "/" + SETTINGS.get('FEED_FILE')
+    Generator.write_stream(path, atom_feed(SETTINGS.get('SITE_TITLE'), absolute_url(SITEDIR),
+                                           feed_url, SETTINGS.get('SITE_AUTHOR'), entries))
+    _index_file_written(path)
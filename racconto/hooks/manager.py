@@ -1,4 +1,30 @@
+from racconto.profiler import Profiler
+
+def aggregate(func):
+    """
+    Marks func as a hook whose output only depends on the collection of
+    pages and posts (archives, indexes). Incremental builds skip it when
+    neither content nor templates have changed.
+    """
+    func.aggregate = True
+    return func
+
+def needs_bodies(func):
+    """
+    Marks a before all or after all hook as one which reads the body of
+    most pages and posts. Content is then parsed in full up front and
+    bodies are kept until the after all hooks have run. Without such
+    hooks content is parsed for its front matter only and each body is
+    read, rendered and released one file at a time.
+    """
+    func.needs_bodies = True
+    return func
+
 class HooksManager(object):
+    """
+    Keeps the registered hooks and runs them. Every hook run is timed
+    by name when the build is profiled.
+    """
 
     after_all_hooks = []
     before_all_hooks = []
@@ -6,24 +32,49 @@ class HooksManager(object):
     before_each_hooks = []
 
     @classmethod
-    def run_after_all_hooks(cls, pages, posts):
+    def run_after_all_hooks(cls, pages, posts, aggregates=True):
         for func in cls.after_all_hooks:
-            func(pages, posts)
+            if aggregates or not getattr(func, 'aggregate', False):
+                cls._run("after_all", func, pages, posts)
 
     @classmethod
-    def run_before_all_hooks(cls, pages, posts):
+    def run_before_all_hooks(cls, pages, posts, aggregates=True):
         for func in cls.before_all_hooks:
-            func(pages, posts)
+            if aggregates or not getattr(func, 'aggregate', False):
+                cls._run("before_all", func, pages, posts)
 
     @classmethod
     def run_before_each_hooks(cls, page_or_post):
         for func in cls.before_each_hooks:
-            func(page_or_post)
+            cls._run("before_each", func, page_or_post)
 
     @classmethod
     def run_after_each_hooks(cls, page_or_post):
         for func in cls.after_each_hooks:
-            func(page_or_post)
+            cls._run("after_each", func, page_or_post)
+
+    @classmethod
+    def needs_bodies(cls):
+        """Returns True if a before all or after all hook needs bodies """
+        return any(getattr(func, 'needs_bodies', False)
+                   for func in cls.before_all_hooks + cls.after_all_hooks)
+
+    @classmethod
+    def aggregate_hooks(cls):
+        """Returns the names of the registered before all and after all
+        aggregate hooks
+        """
+        return ["%s %s.%s" % (kind, getattr(func, '__module__', ''),
+                              getattr(func, '__name__', func.__class__.__name__))
+                for kind, hooks in (("before_all", cls.before_all_hooks),
+                                    ("after_all", cls.after_all_hooks))
+                for func in hooks if getattr(func, 'aggregate', False)]
+
+    @classmethod
+    def _run(cls, kind, func, *args):
+        name = getattr(func, '__name__', func.__class__.__name__)
+        with Profiler.timer("%s hook: %s" % (kind, name)):
+            func(*args)
 
     @classmethod
     def register_after_all_hook(cls, func=None):
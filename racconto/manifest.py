@@ -0,0 +1,334 @@
+import cPickle as pickle
+import hashlib
+import os
+
+from jinja2 import meta, nodes
+from jinja2.exceptions import TemplateNotFound
+
+from racconto.assets import AssetManifest
+from racconto.files import atomic_write
+from racconto.static import file_hash
+
+class BuildManifest(object):
+    """
+    On-disk record of the inputs used by the previous build.
+    For every content file it keeps the source digest, the front matter
+    and the digest of the templates it was rendered with, which lets
+    compile_site skip parsing and rendering of unchanged content.
+    Outputs also record the static assets they link to with asset_url and
+    are outdated when one of them gets another fingerprint.
+    """
+
+    VERSION = 4
+
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+        self.aggregates = None
+        self.settings = None
+        # Signatures of index files generated from a set of content
+        self.index_files = {}
+        # Assets used by index files, as returned by AssetManifest.pop_used
+        self.index_assets = {}
+        # Digests of the template globals set by hooks, by name
+        self.globals = {}
+        self._index_files_generated = set()
+        self._template_digests = {}
+        self._template_source_digests = {}
+
+    def load(self):
+        """Loads the manifest of the previous build, if there is one """
+        try:
+            f = open(self.path, 'rb')
+        except IOError:
+            return
+        try:
+            data = pickle.load(f)
+        except Exception:
+            # A corrupt manifest only costs a full rebuild
+            return
+        finally:
+            f.close()
+        if data.get("version") != self.VERSION:
+            return
+        self.sources = data["sources"]
+        self.aggregates = data["aggregates"]
+        self.settings = data["settings"]
+        self.index_files = data["index_files"]
+        self.index_assets = data["index_assets"]
+        self.globals = data["globals"]
+
+    def save(self):
+        data = {"version": self.VERSION,
+                "sources": self.sources,
+                "aggregates": self.aggregates,
+                "settings": self.settings,
+                "index_files": self.index_files,
+                "index_assets": self.index_assets,
+                "globals": self.globals,
+                }
+        with atomic_write(self.path) as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+    def check_settings(self, settings):
+        """Forgets everything recorded if the settings have changed since
+        the previous build
+        """
+        signature = settings_signature(settings)
+        if signature != self.settings:
+            self.sources = {}
+            self.aggregates = None
+            # Kept, without signatures, so outdated ones can be removed
+            self.index_files = dict.fromkeys(self.index_files)
+        self.settings = signature
+
+    def update_globals(self, digests):
+        """Records the digests of the template globals and returns True if
+        they differ from the previous build. Template digests then cover
+        the current globals the templates use.
+        """
+        if digests == self.globals:
+            return False
+        self.globals = dict(digests)
+        self._template_digests = {}
+        return True
+
+    def forget_templates(self):
+        """Forgets the template digests computed so far, templates
+        may have changed since
+        """
+        self._template_digests = {}
+        self._template_source_digests = {}
+
+    def source_digest(self, filepath, stat=None):
+        """Returns the digest of filepath. The file is only read if
+        its size or mtime differs from what was recorded. stat is
+        the stat of filepath if already known.
+        """
+        if stat is None:
+            stat = os.stat(filepath)
+        record = self.sources.get(filepath)
+        if record and (record["mtime"], record["size"]) == (stat.st_mtime, stat.st_size):
+            return record["digest"]
+        return file_hash(filepath)
+
+    def fresh_record(self, filepath, digest, jinja_env):
+        """Returns the record of filepath if neither the source, the
+        templates it was rendered with nor the fingerprints of the assets
+        it links to have changed and its output still exists. Otherwise
+        returns None.
+        """
+        record = self.sources.get(filepath)
+        if record is None or record["digest"] != digest:
+            return None
+        if record["templates"] != self.template_digest(jinja_env, record["template"]):
+            return None
+        if AssetManifest.changed(record["assets"]):
+            return None
+        if not os.path.exists(record["output"]):
+            return None
+        return record
+
+    def record(self, filepath, digest, content_object, jinja_env, output, assets=None,
+               stat=None):
+        """Stores what is needed to skip and restore content_object
+        on the next build. assets are the assets its output used, as
+        returned by AssetManifest.pop_used. stat is the stat of filepath
+        digest was computed from, a file saved since isn't trusted to be
+        unchanged on the next build.
+        """
+        if stat is None:
+            stat = os.stat(filepath)
+        self.sources[filepath] = {
+            "digest": digest,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "title": content_object.title,
+            "config": content_object.config,
+            "date": getattr(content_object, "date", None),
+            "template": content_object.template,
+            "templates": self.template_digest(jinja_env, content_object.template),
+            "output": output,
+            "assets": assets or {},
+            }
+
+    def prune(self, filepaths):
+        """Forgets sources which no longer exist and returns their records """
+        removed = []
+        for filepath in set(self.sources) - set(filepaths):
+            removed.append(self.sources.pop(filepath))
+        return removed
+
+    def aggregates_changed(self, digests, jinja_env, hooks=()):
+        """Records the signature of the whole content set and of the
+        aggregate hooks, by name, and returns True if it differs from the
+        previous build. Aggregate outputs (archives, blog indexes) only
+        need to be rebuilt when it does, when one of them is missing or
+        when assets they link to got another fingerprint.
+        """
+        h = hashlib.sha1()
+        for filepath in sorted(digests):
+            h.update("%s\0%s\0" % (filepath, digests[filepath]))
+        h.update(self.template_digest(jinja_env, None))
+        for name in hooks:
+            h.update("hook %s\0" % name)
+        signature = h.hexdigest()
+        changed = signature != self.aggregates or \
+            not all(os.path.exists(path) for path in self.index_files) or \
+            any(AssetManifest.changed(assets) for assets in self.index_assets.itervalues())
+        self.aggregates = signature
+        return changed
+
+    def index_file_changed(self, path, jinja_env, template_name, content_objects, arguments):
+        """Records the signature of the index file at path, generated with
+        template_name from content_objects, and returns True if it differs
+        from the previous build or the file is missing. Besides the content
+        objects, their order and the template, the signature covers the
+        plain (string and number) template arguments, and the file is
+        changed if assets it used got another fingerprint.
+        """
+        h = hashlib.sha1()
+        h.update(self.template_digest(jinja_env, template_name))
+        for content_object in content_objects:
+            record = self.sources.get(content_object.source)
+            h.update("%s\0%s\0" % (content_object.source, record and record["digest"]))
+        for key in sorted(arguments):
+            value = arguments[key]
+            if value is None or isinstance(value, (basestring, int, long, float)):
+                h.update("%s\0%r\0" % (key, value))
+        signature = h.hexdigest()
+        self._index_files_generated.add(path)
+        changed = self.index_files.get(path) != signature or not os.path.exists(path) or \
+            AssetManifest.changed(self.index_assets.get(path))
+        self.index_files[path] = signature
+        return changed
+
+    def index_file_assets(self, path, assets):
+        """Records the assets the index file at path used, as returned
+        by AssetManifest.pop_used
+        """
+        if assets:
+            self.index_assets[path] = assets
+        else:
+            self.index_assets.pop(path, None)
+
+    def index_file_written(self, path):
+        """Records that the file at path was generated from the whole
+        content, without a signature to skip it by
+        """
+        self._index_files_generated.add(path)
+        self.index_files[path] = None
+
+    def lastmod(self, filepath):
+        """Returns the mtime of the source filepath as of its last build,
+        or None if it wasn't built
+        """
+        record = self.sources.get(filepath)
+        return record and record["mtime"]
+
+    def prune_index_files(self):
+        """Forgets index files which weren't generated in this build and
+        returns their paths
+        """
+        removed = [path for path in self.index_files
+                   if path not in self._index_files_generated]
+        for path in removed:
+            del self.index_files[path]
+            self.index_assets.pop(path, None)
+        self._index_files_generated = set()
+        return removed
+
+    def template_digest(self, jinja_env, template_name):
+        """Returns a digest covering template_name and every template it
+        extends, includes or imports, and the template globals they use.
+        template_name None, or a template with dynamic references, covers
+        every template.
+        """
+        if template_name in self._template_digests:
+            return self._template_digests[template_name]
+
+        h = hashlib.sha1(self.template_sources_digest(jinja_env, template_name))
+        if self.globals:
+            names = self._template_closure(jinja_env, template_name)
+            if names is None:
+                names = jinja_env.list_templates()
+            variables = self._template_variables(jinja_env, names)
+            for name in sorted(self.globals):
+                if name in variables:
+                    h.update("global %s\0%s\0" % (name, self.globals[name]))
+        digest = h.hexdigest()
+        self._template_digests[template_name] = digest
+        return digest
+
+    def template_sources_digest(self, jinja_env, template_name):
+        """Returns a digest covering the source of template_name and of
+        every template it extends, includes or imports, but not the
+        template globals.
+        """
+        if template_name in self._template_source_digests:
+            return self._template_source_digests[template_name]
+        names = self._template_closure(jinja_env, template_name)
+        if names is None:
+            names = jinja_env.list_templates()
+        h = hashlib.sha1()
+        for name in sorted(names):
+            h.update("%s\0%s\0" % (name, self._template_source_digest(jinja_env, name)))
+        digest = self._template_source_digests[template_name] = h.hexdigest()
+        return digest
+
+    def _template_closure(self, jinja_env, template_name):
+        if template_name is None:
+            return None
+        seen = set()
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                source = jinja_env.loader.get_source(jinja_env, name)[0]
+            except TemplateNotFound:
+                continue
+            for reference in meta.find_referenced_templates(jinja_env.parse(source)):
+                if reference is None:
+                    return None
+                pending.append(reference)
+        return seen
+
+    def _template_variables(self, jinja_env, names):
+        """Returns the names of the variables templates names read. Unlike
+        meta.find_undeclared_variables this doesn't depend on the globals
+        of jinja_env, and includes variables the templates define.
+        """
+        variables = set()
+        for name in names:
+            try:
+                source = jinja_env.loader.get_source(jinja_env, name)[0]
+            except TemplateNotFound:
+                continue
+            variables.update(node.name for node in jinja_env.parse(source).find_all(nodes.Name)
+                             if node.ctx == 'load')
+        return variables
+
+    def _template_source_digest(self, jinja_env, name):
+        try:
+            source = jinja_env.loader.get_source(jinja_env, name)[0]
+        except TemplateNotFound:
+            return ""
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+def settings_signature(settings):
+    """Returns a digest of settings. Callables (e.g. filters) are
+    described by name since their repr changes between runs.
+    """
+    def describe(value):
+        if hasattr(value, '__call__'):
+            return "%s.%s" % (getattr(value, '__module__', ''),
+                              getattr(value, '__name__', repr(value)))
+        if isinstance(value, dict):
+            return sorted((key, describe(value[key])) for key in value)
+        if isinstance(value, (list, tuple)):
+            return [describe(item) for item in value]
+        return value
+    return hashlib.sha1(repr(describe(settings))).hexdigest()
@@ -1,4 +1,5 @@
 import datetime
+from collections import Mapping
 from functools import total_ordering
 from racconto.settings_manager import SettingsManager as SETTINGS
 
@@ -6,29 +7,157 @@ from racconto.settings_manager import SettingsManager as SETTINGS
 # Content containers (Post and Page)
 #
 
+class TemplateContext(Mapping):
+    """
+    Read-only view of the parameters a Post or Page is rendered with:
+    its front matter plus title and body (and date for posts). Nothing
+    is copied, values are looked up when read and the body is only
+    converted if it is read. replace holds values to use instead of
+    the defaults, e.g. a placeholder for the body.
+    """
+    def __init__(self, content_object, replace=None):
+        self._content = content_object
+        self._replace = replace or {}
+
+    def __getitem__(self, key):
+        content = self._content
+        if key in content._context_overrides:
+            return getattr(content, key)
+        if key in content.config:
+            return content.config[key]
+        if key in content._context_defaults:
+            if key in self._replace:
+                return self._replace[key]
+            return getattr(content, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __contains__(self, key):
+        content = self._content
+        return (key in content.config or key in content._context_defaults
+                or key in content._context_overrides)
+
+    def _keys(self):
+        content = self._content
+        keys = set(content.config)
+        keys.update(content._context_defaults)
+        keys.update(content._context_overrides)
+        return keys
+
 class ContentBase(object):
     """ Base class for compiled content """
+
+    __slots__ = ("title", "template", "_body", "markdown", "config",
+                 "source", "slug", "filepath")
+
+    # Attributes in the template context, front matter overrides
+    # the defaults but not the overrides
+    _context_defaults = ("title", "body")
+    _context_overrides = ()
+
     def __init__(self, options):
         self.title = options["title"]
         self.template = options["template"]
-        self.body = options["body"]
-        if "slug" in options.keys():
+        # Either converted html or markdown, which is converted on demand
+        self._body = options.get("body")
+        self.markdown = options.get("markdown")
+        self.config = options["config"] or {}
+        self.source = options["filepath"]
+        if "slug" in options:
             self.slug = options["slug"]
         else:
             self.slug = options["filepath"].split("/")[-1:][0].split(".")[0:-1][0]
 
-        self.template_parameters = {"title": self.title,
-                                    "body": self.body,
-                                   }
-        # Add config variables to template parameters
-        for param in options["config"]:
-            self.template_parameters[param] = options["config"][param]
+    def __getstate__(self):
+        return dict((name, getattr(self, name, None)) for name in self._slot_names())
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def _slot_names(cls):
+        names = []
+        for klass in cls.__mro__:
+            names.extend(getattr(klass, "__slots__", ()))
+        return names
+
+    @property
+    def body(self):
+        """The html body. Markdown is converted the first time the body
+        is read, content without markdown (restored from a build manifest
+        or parsed metadata only) reads it from its source first. The
+        markdown of large sources isn't read whole, they are converted a
+        section at a time.
+        """
+        if self._body is None:
+            # parsers imports models
+            from racconto.parsers import RaccontoParser, markdown_to_html
+            parser = RaccontoParser()
+            if self.markdown is None and parser.is_large(self.source):
+                self._body = parser.read_large_body(self.source,
+                                                    SETTINGS.get('LARGE_FILE_SPILL_DIR'))
+                return self._body
+            if self.markdown is None:
+                self.markdown = parser.read_markdown(self.source)
+            self._body = markdown_to_html(self.markdown)
+            self.markdown = None
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    def release_body(self):
+        """Forgets the body and markdown, they are read from
+        the source again if needed
+        """
+        self._body = None
+        self.markdown = None
+
+    @property
+    def template_parameters(self):
+        """Read-only view of the template parameters. Change
+        config to add or change parameters.
+        """
+        return TemplateContext(self)
+
+    def template_context(self, **replace):
+        """Returns the parameters the template is rendered with,
+        replace overrides title or body
+        """
+        return TemplateContext(self, replace)
+
+    def streams_body(self):
+        """True if the body is to be converted to a temporary file and
+        streamed into the output: it isn't in memory and the source is
+        larger than the LARGE_FILE_SIZE setting
+        """
+        # parsers imports models
+        from racconto.parsers import RaccontoParser
+        return self._body is None and self.markdown is None and \
+            RaccontoParser.is_large(self.source)
 
 class Page(ContentBase):
+
+    __slots__ = ()
+
     def __init__(self, options):
         super(Page, self).__init__(options)
-        self.filepath = "%s" % self.slug
-        self.template = options["config"].get("template", SETTINGS.get('PAGE_TEMPLATE'))
+        # Pages in subdirectories of CONTENTDIR keep them, docs/about.md
+        # and about.md are two pages
+        directory = self.source.rpartition("/")[0]
+        content = "./%s/" % SETTINGS.get('CONTENTDIR')
+        if directory.startswith(content):
+            self.filepath = "%s/%s" % (directory[len(content):], self.slug)
+        else:
+            self.filepath = "%s" % self.slug
+        self.template = self.config.get("template", SETTINGS.get('PAGE_TEMPLATE'))
 
     def __str__(self):
         return "%s" % self.title
@@ -39,18 +168,22 @@ class Post(ContentBase):
     Container for posts
     Implements __lt__ for sorting posts on their published date
     """
+
+    __slots__ = ("date",)
+
+    _context_overrides = ("date",)
+
     def __init__(self, options):
         """
         post - dictionary consisting of post properties
         """
         super(Post, self).__init__(options)
-        self.slug = self.slug[11:] # Truncate date
+        if "slug" not in options:
+            self.slug = self.slug[11:] # Truncate date
         self.date = options["date"]
-        self.template = options["config"].get("template", SETTINGS.get('PAGE_TEMPLATE'))
-        self.template_parameters["date"] = self.date
-        self.filepath = "%s/%s" % (str(self.date.strftime('%Y-%m-%d')).replace('-','/'),
-            self.slug,
-            )
+        self.template = self.config.get("template", SETTINGS.get('PAGE_TEMPLATE'))
+        self.filepath = "%04d/%02d/%02d/%s" % (self.date.year, self.date.month,
+                                               self.date.day, self.slug)
 
     def __repr__(self):
         return "Post('%s', %s)" % (self.title, self.date)
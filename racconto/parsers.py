@@ -1,12 +1,77 @@
 import codecs
-from datetime import datetime
+import io
+import os
+import re
+import tempfile
+
 import markdown2 as m
-import yaml
 
+from racconto.cache import MarkdownCache
+from racconto.filenames import classify
+from racconto.frontmatter import FrontMatter
 from racconto.models import Post, Page
+from racconto.profiler import Profiler
 
 from racconto.settings_manager import SettingsManager as SETTINGS
 
+def markdown_to_html(text):
+    """Converts markdown text to html using the MARKDOWN_EXTRAS setting.
+    Conversions are looked up in, and stored to, the markdown cache.
+    """
+    extras = SETTINGS.get('MARKDOWN_EXTRAS')
+    with Profiler.timer("markdown cache"):
+        key = MarkdownCache.key(text, extras)
+        html = MarkdownCache.get(key)
+    if html is None:
+        with Profiler.timer("markdown"):
+            html = m.markdown(text, extras=extras)
+        with Profiler.timer("markdown cache"):
+            MarkdownCache.set(key, html)
+    return html
+
+_fence_re = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})")
+# [id]: url, but not footnotes ([^id]: text)
+_link_definition_re = re.compile(r"^[ ]{0,3}\[[^\]^][^\]]*\]:[ \t]*\S")
+
+def markdown_sections(lines, size):
+    """Joins markdown lines into sections of at least size characters,
+    split before headings (following a blank line) outside fenced code.
+    """
+    section, length = [], 0
+    fence, blank = None, True
+    for line in lines:
+        match = _fence_re.match(line)
+        if fence is None:
+            if match:
+                fence = match.group(1)
+            elif blank and line.startswith("#") and length >= size:
+                yield u"".join(section)
+                section, length = [], 0
+        elif match and match.group(1).startswith(fence):
+            fence = None
+        section.append(line)
+        length += len(line)
+        blank = not line.strip()
+    if section:
+        yield u"".join(section)
+
+def link_definitions(lines):
+    """Returns the reference link definitions in markdown lines
+    outside fenced code
+    """
+    definitions = []
+    fence = None
+    for line in lines:
+        match = _fence_re.match(line)
+        if fence is None:
+            if match:
+                fence = match.group(1)
+            elif _link_definition_re.match(line):
+                definitions.append(line.rstrip("\r\n"))
+        elif match and match.group(1).startswith(fence):
+            fence = None
+    return u"\n".join(definitions)
+
 class MissingYAMLFrontMatterError(Exception):
     def __init__(self, value):
         self.value = value
@@ -15,84 +80,206 @@ class MissingYAMLFrontMatterError(Exception):
 
 class RaccontoParser():
 
-    def parse(self, filepath):
-        """Parses markdown content to html files.
+    # Bytes read at a time when only the front matter is wanted
+    CHUNK_SIZE = 4096
+    # Characters of markdown converted at a time in large files
+    SECTION_SIZE = 32 * 1024
+
+    @staticmethod
+    def is_large(filepath):
+        """True if filepath is larger than the LARGE_FILE_SIZE setting """
+        threshold = SETTINGS.get('LARGE_FILE_SIZE')
+        return threshold is not None and os.path.getsize(filepath) > threshold
+
+    def parse(self, filepath, metadata_only=False):
+        """Parses a markdown file into a Post or Page. The markdown
+        is converted to html the first time the body is read.
         If file doesn't have a YAML Front Matter it
-        stops parsing and returns None
+        stops parsing and returns None.
+        With metadata_only, or if the file is large, the
+        markdown is not read until the body is needed.
         """
-        try:
-            config, content = self._config_and_content_reader(filepath)
-        except MissingYAMLFrontMatterError:
-            print "File at '%s' is missing a YAML Front Matter config" % filepath
-            return None
+        if not metadata_only and self.is_large(filepath):
+            metadata_only = True
+        with Profiler.timer("parse"):
+            try:
+                config, content = self._config_and_content_reader(filepath, metadata_only)
+            except MissingYAMLFrontMatterError:
+                print "File at '%s' is missing a YAML Front Matter config" % filepath
+                return None
 
-        return self._parse_file(filepath, config, content)
+            return self._parse_file(filepath, config, content)
 
-    def _config_and_content_reader(self, filepath):
-        """Reads config and content from file """
-        config_separator = SETTINGS.get('CONFIG_SEPARATOR')
-        f = codecs.open(filepath, 'r', 'utf-8')
-        lines = f.readlines()
-        f.close()
+    def restore(self, filepath, record):
+        """Recreates a Post or Page from a build manifest record
+        without reading the file. The markdown is read from the
+        file if the body is needed.
+        """
+        kind, date, slug = classify(filepath)
+        if record["date"] is not None:
+            return self._create_post(filepath, record["config"], None, record["date"], slug)
+        return self._create_page(filepath, record["config"], None, slug)
 
-        raw_data = {"config": "", "content": "", "reading_config": False }
+    def read_markdown(self, filepath):
+        """Returns the markdown content of file, without its front matter """
+        return self._read_raw(filepath)[1].decode('utf-8')
 
-        for index, line in enumerate(lines):
-            # File must start with YAML Front Matter
-            if index == 0 and not line.startswith(config_separator):
-                raise MissingYAMLFrontMatterError("File must start with YAML Front Matter")
+    def spill_body(self, filepath, directory=None):
+        """Converts the markdown of filepath to html in a temporary file
+        in directory and returns its path. The markdown is read a line at
+        a time and converted a section at a time, the file is never in
+        memory as a whole. Reference link definitions are handed to every
+        section, footnotes and the table of contents are per section.
+        """
+        definitions = link_definitions(self._markdown_lines(filepath))
+        out = tempfile.NamedTemporaryFile(prefix="racconto-", suffix=".html",
+                                          dir=directory, delete=False)
+        try:
+            sections = markdown_sections(self._markdown_lines(filepath), self.SECTION_SIZE)
+            for i, section in enumerate(sections):
+                if definitions:
+                    section = u"%s\n\n%s\n" % (section, definitions)
+                if i:
+                    # Blocks are separated by a blank line, as in one conversion
+                    out.write("\n")
+                out.write(markdown_to_html(section).encode('utf-8'))
+        except:
+            out.close()
+            os.remove(out.name)
+            raise
+        out.close()
+        return out.name
 
-            if line.startswith(config_separator):
-                raw_data["reading_config"] = not raw_data["reading_config"]
-                continue
-            if raw_data["reading_config"]:
-                raw_data["config"] += line
+    def read_large_body(self, filepath, directory=None):
+        """Returns the html of filepath, converted a section at a time
+        with spill_body, for large files whose body is needed in memory
+        """
+        path = self.spill_body(filepath, directory)
+        try:
+            f = codecs.open(path, 'r', 'utf-8')
+            try:
+                return f.read()
+            finally:
+                f.close()
+        finally:
+            os.remove(path)
+
+    def _markdown_lines(self, filepath):
+        """Yields the lines of the markdown content of file """
+        f = io.open(filepath, 'rb')
+        try:
+            data, bounds = self._read_front_matter(f)
+            f.seek(bounds[2])
+            for line in io.TextIOWrapper(f, encoding='utf-8'):
+                yield line
+        finally:
+            f.close()
+
+    def _config_and_content_reader(self, filepath, metadata_only=False):
+        """Reads config and markdown content from file.
+        With metadata_only only the front matter is read and content is None.
+        """
+        with Profiler.timer("parse: read", filepath):
+            raw_config, raw_content = self._read_raw(filepath, metadata_only)
+        with Profiler.timer("parse: yaml", filepath):
+            config = FrontMatter.load(raw_config.decode('utf-8'))
+        if metadata_only:
+            return config, None
+        return config, raw_content.decode('utf-8')
+
+    def _read_raw(self, filepath, metadata_only=False):
+        """Reads the raw front matter and content from file """
+        f = codecs.open(filepath, 'rb')
+        try:
+            if metadata_only:
+                data, bounds = self._read_front_matter(f)
             else:
-                raw_data["content"] += line
+                data = f.read()
+                bounds = self._front_matter_bounds(data, True)
+        finally:
+            f.close()
+        config_start, config_end, content_start = bounds
 
-        if raw_data["reading_config"]:
-          raise MissingYAMLFrontMatterError("Reached EOF before YAML Front Matter ended")
+        if metadata_only:
+            return data[config_start:config_end], None
+        return data[config_start:config_end], data[content_start:]
 
-        # Parse config and content
-        config = yaml.load(raw_data["config"])
-        extras = SETTINGS.get('MARKDOWN_EXTRAS')
-        content = m.markdown(raw_data["content"], extras=extras)
+    def _read_front_matter(self, f):
+        """Reads just enough of file f to get past the front matter.
+        Returns the data read and the front matter bounds.
+        """
+        data = ""
+        bounds = None
+        while bounds is None:
+            chunk = f.read(self.CHUNK_SIZE)
+            data += chunk
+            bounds = self._front_matter_bounds(data, not chunk)
+        return data, bounds
 
-        return config, content
+    def _front_matter_bounds(self, data, complete):
+        """Finds the YAML Front Matter in the raw data of a file in one pass.
+        Returns the offsets (config_start, config_end, content_start), or
+        None if data is not complete and doesn't reach past the front matter.
+        """
+        config_separator = SETTINGS.get('CONFIG_SEPARATOR')
+        # File must start with YAML Front Matter
+        if not data.startswith(config_separator):
+            if complete or len(data) >= len(config_separator):
+                raise MissingYAMLFrontMatterError("File must start with YAML Front Matter")
+            return None
+
+        config_start = data.find("\n") + 1
+        if config_start:
+            # Front matter ends at the first line starting with the separator,
+            # separators further down are part of the content
+            config_end = data.find("\n" + config_separator, config_start - 1) + 1
+            if config_end:
+                content_start = data.find("\n", config_end) + 1
+                if content_start:
+                    return config_start, config_end, content_start
+                if complete:
+                    return config_start, config_end, len(data)
+
+        if complete:
+            raise MissingYAMLFrontMatterError("Reached EOF before YAML Front Matter ended")
+        return None
 
     def _parse_file(self, filepath, config, content):
         """Determines what type of content this is from filename
         and then calls the appropriate object creator method
         """
-        filename = filepath.split('/')[-1:][0]
-        possible_date = " ".join(filename.split('-')[0:3])
-        try:
-            date = datetime.strptime(possible_date, "%Y %m %d")
-            return self._create_post(filepath, config, content, date)
-        except ValueError:
-            return self._create_page(filepath, config, content)
+        kind, date, slug = classify(filepath)
+        if kind == "post":
+            return self._create_post(filepath, config, content, date, slug)
+        return self._create_page(filepath, config, content, slug)
 
-    def _create_post(self, filepath, config, content, date):
+    def _create_post(self, filepath, config, content, date, slug=None):
         """Creates a Post from file data
         """
         template = config.get("template", SETTINGS.get('POST_TEMPLATE'))
-        return Post({
-                "title": config["title"],
-                "body":  content,
-                "template": template,
-                "date": date,
-                "filepath": filepath,
-                "config": config,
-                })
-
-    def _create_page(self, filepath, config, content):
+        options = {
+            "title": config["title"],
+            "markdown": content,
+            "template": template,
+            "date": date,
+            "filepath": filepath,
+            "config": config,
+            }
+        if slug is not None:
+            options["slug"] = slug
+        return Post(options)
+
+    def _create_page(self, filepath, config, content, slug=None):
         """Creates a Page from file data
         """
         template = config.get("template", SETTINGS.get('PAGE_TEMPLATE'))
-        return Page({
-                "title": config["title"],
-                "body": content,
-                "template": template,
-                "filepath": filepath,
-                "config": config,
-                })
+        options = {
+            "title": config["title"],
+            "markdown": content,
+            "template": template,
+            "filepath": filepath,
+            "config": config,
+            }
+        if slug is not None:
+            options["slug"] = slug
+        return Page(options)
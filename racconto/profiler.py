@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+
+class _Timer(object):
+    """Times a block and adds it to the profiler on exit """
+
+    def __init__(self, profiler, phase, source, template):
+        self.profiler = profiler
+        self.phase = phase
+        self.source = source
+        self.template = template
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(time.time() - self.started,
+                          self.phase, self.source, self.template)
+        return False
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_null_timer = _NullTimer()
+
+class Profiler(object):
+    """
+    Collects build timings per phase, per source file and per template.
+    Disabled unless enabled is set, timers are then no-ops.
+    """
+
+    enabled = False
+    # name -> [seconds, calls]
+    phases = {}
+    # source path -> seconds
+    sources = {}
+    # template name -> seconds
+    templates = {}
+    # Sources may be discovered in a thread feeding the worker pool
+    lock = threading.RLock()
+
+    @classmethod
+    def timer(cls, phase, source=None, template=None):
+        """Returns a context manager which adds the time spent in it to
+        phase, source and template. Use phase None to only attribute
+        time to a source or template, e.g. when it is already counted
+        in a nested phase.
+        """
+        if not cls.enabled:
+            return _null_timer
+        return _Timer(cls, phase, source, template)
+
+    @classmethod
+    def add(cls, seconds, phase, source=None, template=None):
+        with cls.lock:
+            if phase is not None:
+                timing = cls.phases.setdefault(phase, [0.0, 0])
+                timing[0] += seconds
+                timing[1] += 1
+            if source is not None:
+                cls.sources[source] = cls.sources.get(source, 0.0) + seconds
+            if template is not None:
+                cls.templates[template] = cls.templates.get(template, 0.0) + seconds
+
+    @classmethod
+    def pop(cls):
+        """Returns the timings collected so far and resets them,
+        or None when disabled
+        """
+        if not cls.enabled:
+            return None
+        timings = {"phases": cls.phases,
+                   "sources": cls.sources,
+                   "templates": cls.templates,
+                   }
+        cls.phases, cls.sources, cls.templates = {}, {}, {}
+        return timings
+
+    @classmethod
+    def merge(cls, timings):
+        """Adds timings popped in another build process """
+        if timings is None:
+            return
+        with cls.lock:
+            for phase, (seconds, calls) in timings["phases"].items():
+                timing = cls.phases.setdefault(phase, [0.0, 0])
+                timing[0] += seconds
+                timing[1] += calls
+            for source, seconds in timings["sources"].items():
+                cls.add(seconds, None, source=source)
+            for template, seconds in timings["templates"].items():
+                cls.add(seconds, None, template=template)
+
+    @classmethod
+    def report(cls, top=10):
+        """Prints the time spent per phase and the slowest files and templates """
+        print "%-50s %10s %8s" % ("Phase", "Seconds", "Calls")
+        for phase, (seconds, calls) in sorted(cls.phases.items(),
+                                              key=lambda item: -item[1][0]):
+            print "%-50s %10.3f %8d" % (phase, seconds, calls)
+        for title, timings in (("File", cls.sources), ("Template", cls.templates)):
+            print
+            print "%-61s %10s" % ("Slowest %s" % title.lower() + "s", "Seconds")
+            for name, seconds in cls._slowest(timings, top):
+                print "%-61s %10.3f" % (name, seconds)
+
+    @classmethod
+    def dump(cls, path, top=10, stats=None):
+        """Writes the timings, and the build's stats if given, as JSON to path """
+        f = open(path, 'w')
+        try:
+            json.dump({"stats": stats or {},
+                       "phases": dict((phase, {"seconds": seconds, "calls": calls})
+                                      for phase, (seconds, calls) in cls.phases.items()),
+                       "slowest_sources": cls._slowest(cls.sources, top),
+                       "slowest_templates": cls._slowest(cls.templates, top),
+                       }, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+    @staticmethod
+    def _slowest(timings, top):
+        return sorted(timings.items(), key=lambda item: -item[1])[:top]
@@ -0,0 +1,93 @@
+import os
+import SimpleHTTPServer
+import SocketServer
+import threading
+import time
+
+from racconto.settings_manager import SettingsManager as SETTINGS
+
+class SiteRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """Serves files from root instead of the current directory """
+
+    root = None
+
+    def translate_path(self, path):
+        path = SimpleHTTPServer.SimpleHTTPRequestHandler.translate_path(self, path)
+        return os.path.join(self.root, os.path.relpath(path, os.getcwd()))
+
+class SiteServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class Watcher(object):
+    """
+    Polls directories for files which were added, modified or removed.
+    Paths are reported in the './directory/file' form glob returns them in.
+    """
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.snapshot = self._snapshot()
+
+    def poll(self):
+        """Returns the set of paths changed since the previous poll """
+        snapshot = self._snapshot()
+        changed = set(path for path in snapshot
+                       if self.snapshot.get(path) != snapshot[path])
+        changed.update(set(self.snapshot) - set(snapshot))
+        self.snapshot = snapshot
+        return changed
+
+    def _snapshot(self):
+        snapshot = {}
+        for directory in self.directories:
+            for root, dirs, files in os.walk('./%s' % directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue # Removed while walking
+                    snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+def serve(builder, port, interval=0.2):
+    """
+    Builds the site with builder, serves SITEDIR on port and rebuilds
+    whenever a file in CONTENTDIR, TEMPLATEDIR or STATICDIR changes.
+    Runs until interrupted.
+    """
+    watcher = Watcher([SETTINGS.get('CONTENTDIR'),
+                       SETTINGS.get('TEMPLATEDIR'),
+                       SETTINGS.get('STATICDIR'),
+                       ])
+    builder.build()
+
+    SiteRequestHandler.root = os.path.abspath(SETTINGS.get('SITEDIR'))
+    server = SiteServer(("127.0.0.1", port), SiteRequestHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    print "Serving %s at http://127.0.0.1:%d/ (Ctrl-C to stop)" % (SETTINGS.get('SITEDIR'), port)
+
+    try:
+        while True:
+            time.sleep(interval)
+            changed = watcher.poll()
+            if not changed:
+                continue
+            started = time.time()
+            try:
+                result = builder.build(changed)
+            except Exception, e:
+                # Keep serving, the next change may fix it
+                print "[Error] Build failed: %s" % e
+                continue
+            print "Rebuilt %d of %d files in %d ms" % (result["generated"],
+                                                      result["sources"],
+                                                      (time.time() - started) * 1000)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
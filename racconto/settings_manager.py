@@ -13,11 +13,53 @@ class SettingsManager(object):
         "POST_TEMPLATE": 'post.j2',
         "PAGE_TEMPLATE": 'page.j2',
         'BLOG_INDEX_TEMPLATE': 'index.j2',
+        'ARCHIVE_PAGE_SIZE': None, # posts per year and month archive page, None for all
+        'BLOG_INDEX_PAGE_SIZE': 10, # posts per page of the paginated blog index
 
+        # Front matter keys posts are grouped by, see build_taxonomies
+        'TAXONOMIES': [], # e.g. ['tags', 'categories']
+        'TAXONOMY_TEMPLATE': 'taxonomy.j2', # posts of a term
+        'TAXONOMY_INDEX_TEMPLATE': 'taxonomy_index.j2', # terms of a key
+        'TAXONOMY_PAGE_SIZE': 10, # posts per term page, None for all
+
+        # Feed and sitemap, see generate_feed and generate_sitemap
+        'SITE_URL': '', # e.g. 'http://example.com', feeds and sitemaps need absolute URLs
+        'SITE_TITLE': '',
+        'SITE_AUTHOR': '',
+        'FEED_FILE': 'feed.xml', # in SITEDIR
+        'FEED_SIZE': 20, # latest posts in the feed
+        'SITEMAP_FILE': 'sitemap.xml', # in SITEDIR
+        'SITEMAP_MAX_URLS': 50000, # per sitemap, larger sitemaps are split
+
+        # Static files copied to the site root rather than SITEDIR/STATICDIR
+        'STATIC_ROOT_FILES': ['favicon.ico', 'apple-touch-icon.png'],
+        'STATIC_HASHES': False, # compare content, not only size and mtime
+        'STATIC_HARDLINKS': False, # hard link static files instead of copying
+        'FINGERPRINT_STATIC': False, # also write static files with content hash names
+        'ASSET_MANIFEST': 'manifest.json', # fingerprinted names, in SITEDIR/STATICDIR
+
+        # Write .gz (and .br, with the brotli package) siblings of text files
+        'PRECOMPRESS': False,
+        'PRECOMPRESS_MIN_SIZE': 1024, # bytes
+        'PRECOMPRESS_EXTENSIONS': ['.html', '.css', '.js', '.json', '.xml', '.svg', '.txt'],
+
+        # Sources whose path ends like one of these are posts, see filenames.py
+        'POST_FILENAME_PATTERNS': ['YYYY-MM-DD-slug'],
         'IGNORE_PATTERNS': [],
+        # Sources larger than this are converted and written without being
+        # held in memory, see Generator._generate_streamed. None disables it
+        'LARGE_FILE_SIZE': 8 * 1024 * 1024, # bytes
+        'LARGE_FILE_SPILL_DIR': None, # temporary files, None for the system's
         "CONFIG_SEPARATOR": '---',
         'FILTERS': {},
         'MARKDOWN_EXTRAS': ["fenced-code-blocks"],
+        'MANIFEST_FILE': '.racconto-manifest',
+        'MARKDOWN_CACHE_DIR': '.racconto-cache/markdown',
+        'MARKDOWN_CACHE_SIZE': 256 * 1024 * 1024, # bytes
+        'FRAGMENT_CACHE_DIR': '.racconto-cache/fragments', # see {% cache %}
+        'FRAGMENT_CACHE_SIZE': 64 * 1024 * 1024, # bytes
+        'TEMPLATE_CACHE_DIR': '.racconto-cache/templates', # jinja bytecode cache
+        'COMPILED_TEMPLATES_DIR': '.racconto-cache/compiled', # see --compile-templates
         }
 
     settings = _default_settings.copy()
@@ -0,0 +1,144 @@
+import errno
+import hashlib
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from racconto.files import makedirs, temporary_path
+
+# ioctl creating a copy-on-write clone of a file (btrfs, xfs)
+FICLONE = 0x40049409
+
+class StaticSync(object):
+    """
+    Keeps a copy of a directory in sync with it. Only new and changed files
+    (by size and mtime, optionally by content hash) are copied, using
+    reflinks or, if enabled, hard links where the filesystem supports them.
+    Files removed from the source are removed from the copy.
+    """
+
+    def __init__(self, hashes=False, hardlinks=False):
+        self.hashes = hashes
+        self.hardlinks = hardlinks
+        self.reflinks = fcntl is not None
+        self.stats = {"copied": 0, "unchanged": 0, "removed": 0}
+        # Destination paths of the files copied
+        self.copied = set()
+
+    def sync(self, source, destination, root_files=(), root=None, fingerprints=None,
+             keep=(), sibling_suffixes=()):
+        """
+        Syncs destination with source. Files named in root_files at the top
+        of source are synced to root instead of destination. fingerprints
+        maps paths relative to source to additional names in destination
+        the files are synced to. Files in keep are never removed, nor are
+        synced files' siblings with one of sibling_suffixes (e.g. ".gz").
+        Returns the set of destination paths of all synced files.
+        """
+        synced = set(os.path.normpath(path) for path in keep)
+        for directory, dirs, files in os.walk(source):
+            relative = os.path.relpath(directory, source)
+            for name in files:
+                if relative == os.curdir and name in root_files:
+                    targets = [os.path.join(root, name)]
+                else:
+                    relative_path = os.path.normpath(os.path.join(relative, name))
+                    targets = [os.path.join(destination, relative_path)]
+                    fingerprinted = (fingerprints or {}).get(relative_path.replace(os.sep, "/"))
+                    if fingerprinted is not None:
+                        targets.append(os.path.join(destination, fingerprinted))
+                for target in targets:
+                    target = os.path.normpath(target)
+                    self.sync_file(os.path.join(directory, name), target)
+                    synced.add(target)
+        self._remove_missing(destination, synced, sibling_suffixes)
+        return synced
+
+    def sync_file(self, source, target):
+        """Copies source to target unless target is up to date """
+        source_stat = os.stat(source)
+        try:
+            target_stat = os.stat(target)
+        except OSError:
+            target_stat = None
+
+        if target_stat is not None and target_stat.st_size == source_stat.st_size:
+            if abs(target_stat.st_mtime - source_stat.st_mtime) < 0.001:
+                self.stats["unchanged"] += 1
+                return False
+            if self.hashes and file_hash(source) == file_hash(target):
+                # Same content, only the mtime differs
+                shutil.copystat(source, target)
+                self.stats["unchanged"] += 1
+                return False
+
+        directory = os.path.dirname(target)
+        if directory:
+            makedirs(directory)
+        # Never write into target, it may be a hard link to source
+        tmp_path = temporary_path(target)
+        if not (self.hardlinks and self._hardlink(source, tmp_path)):
+            if not (self.reflinks and self._reflink(source, tmp_path)):
+                shutil.copyfile(source, tmp_path)
+            shutil.copystat(source, tmp_path)
+        os.rename(tmp_path, target)
+        self.stats["copied"] += 1
+        self.copied.add(target)
+        return True
+
+    def _hardlink(self, source, target):
+        try:
+            os.link(source, target)
+            return True
+        except OSError:
+            # E.g. another filesystem, copy instead from now on
+            self.hardlinks = False
+            return False
+
+    def _reflink(self, source, target):
+        source_file = open(source, 'rb')
+        try:
+            target_file = open(target, 'wb')
+            try:
+                fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+                return True
+            except (IOError, OSError), e:
+                if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV):
+                    # Not supported by the filesystem, copy instead from now on
+                    self.reflinks = False
+                    return False
+                raise
+            finally:
+                target_file.close()
+        finally:
+            source_file.close()
+
+    def _remove_missing(self, destination, synced, sibling_suffixes=()):
+        """Removes files in destination which weren't synced, and
+        directories left empty
+        """
+        for directory, dirs, files in os.walk(destination, topdown=False):
+            for name in files:
+                path = os.path.normpath(os.path.join(directory, name))
+                base, suffix = os.path.splitext(path)
+                if suffix in sibling_suffixes and base in synced:
+                    continue
+                if path not in synced:
+                    os.remove(path)
+                    self.stats["removed"] += 1
+            if directory != destination and not os.listdir(directory):
+                os.rmdir(directory)
+
+def file_hash(path):
+    h = hashlib.sha1()
+    f = open(path, 'rb')
+    try:
+        for chunk in iter(lambda: f.read(1024 * 1024), ""):
+            h.update(chunk)
+    finally:
+        f.close()
+    return h.hexdigest()
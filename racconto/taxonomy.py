@@ -0,0 +1,129 @@
+import hashlib
+import math
+import re
+
+_slug_re = re.compile(r"[^\w]+", re.UNICODE)
+_fold_re = re.compile(r"[\s_-]+", re.UNICODE)
+# Symbols which tell terms apart, "C", "C++" and "C#"
+_symbols = ((u"+", u" plus "), (u"#", u" sharp "), (u"&", u" and "), (u"@", u" at "))
+
+def term_slug(name):
+    """Returns the URL slug of a term, "Static Sites" -> "static-sites",
+    "C++" -> "c-plus-plus". A name without letters, digits or the symbols
+    above gets a digest of itself.
+    """
+    slug = name.lower()
+    for symbol, word in _symbols:
+        slug = slug.replace(symbol, word)
+    slug = _slug_re.sub("-", slug).strip("-")
+    if not slug:
+        slug = _digest(name)
+    return slug
+
+def fold(name):
+    """Returns what tells terms apart, names differing only in case,
+    spaces, hyphens and underscores are the same term
+    """
+    return _fold_re.sub(u" ", name.lower()).strip()
+
+def _digest(name):
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+
+class Term(object):
+    """A tag or category and its posts, newest first """
+
+    __slots__ = ("name", "slug", "url", "posts")
+
+    def __init__(self, name, slug, url):
+        self.name = name
+        self.slug = slug
+        self.url = url
+        self.posts = []
+
+    @property
+    def count(self):
+        return len(self.posts)
+
+    def __repr__(self):
+        return "Term(%r, %d)" % (self.name, len(self.posts))
+
+class Taxonomy(object):
+    """
+    Inverted index of the posts by the terms of a front matter key, e.g.
+    tags: [python, static sites]. Built in one pass over the posts, which
+    must be sorted, so each term's posts are sorted too. Terms differing
+    only in case, spaces, hyphens or underscores ("Static sites",
+    "static-sites") are one. url is the URL of the taxonomy, terms are at
+    url + slug + "/". Distinct terms with the same slug ("c.d" and "c d")
+    are told apart by a digest of their name, added to the slug of all
+    but the one whose name is the slug, or else comes first.
+    """
+
+    def __init__(self, key, posts, url):
+        self.key = key
+        self.url = url
+        # folded name -> term
+        terms = {}
+        for post in posts:
+            values = post.config.get(key)
+            if not values:
+                continue
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            for value in values:
+                name = unicode(value)
+                folded = fold(name)
+                term = terms.get(folded)
+                if term is None:
+                    term = terms[folded] = Term(name, term_slug(name), None)
+                # A term listed twice in one post
+                if not term.posts or term.posts[-1] is not post:
+                    term.posts.append(post)
+
+        slugs = {}
+        for folded, term in terms.iteritems():
+            slugs.setdefault(term.slug, []).append((folded, term))
+        self.index = {}
+        for slug, named in slugs.iteritems():
+            # The term named like the slug keeps it
+            named.sort(key=lambda (folded, term): (folded != slug.replace("-", " "), folded))
+            for i, (folded, term) in enumerate(named):
+                if i:
+                    term.slug = "%s-%s" % (slug, _digest(folded))
+                term.url = "%s%s/" % (url, term.slug)
+                self.index[term.slug] = term
+        self.terms = sorted(self.index.itervalues(), key=lambda term: term.slug)
+
+    def __getitem__(self, slug):
+        return self.index[slug]
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def most_used(self, count=None):
+        """Returns the terms with the most posts first """
+        return sorted(self.terms, key=lambda term: -len(term.posts))[:count]
+
+    def cloud(self, steps=5):
+        """Returns (term, weight) for every term, weight from 1 to steps
+        on a logarithmic scale of the number of posts
+        """
+        if not self.terms:
+            return []
+        counts = [math.log(len(term.posts)) for term in self.terms]
+        low, high = min(counts), max(counts)
+        spread = (high - low) or 1.0
+        return [(term, 1 + int(round((count - low) / spread * (steps - 1))))
+                for term, count in zip(self.terms, counts)]
+
+    def digest(self):
+        """Returns a digest of the terms and their posts' titles and order """
+        h = hashlib.sha1(self.key)
+        for term in self.terms:
+            h.update((u"%s\0%s\0" % (term.slug, term.name)).encode('utf-8'))
+            for post in term.posts:
+                h.update((u"%s\0%s\0" % (post.source, post.title)).encode('utf-8'))
+        return h.hexdigest()
@@ -0,0 +1,96 @@
+import itertools
+import multiprocessing
+
+from racconto.assets import AssetManifest
+from racconto.compress import Compressor
+from racconto.fragments import FragmentCache
+from racconto.generator import Generator
+from racconto.parsers import RaccontoParser
+from racconto.profiler import Profiler
+
+#
+# Worker functions have to be module level to be picklable.
+# Pool workers are forked after the settings have been loaded and the
+# jinja environment has been set up, so they share the parent's state.
+#
+
+def _start():
+    # Forget what the parent had collected before forking,
+    # it is only what the worker collects which is handed over
+    Generator.pop_stats()
+    FragmentCache.pop_stats()
+    Profiler.pop()
+    Compressor.pop_pending()
+
+def _parse(job):
+    filepath, metadata_only = job
+    parsed_file = RaccontoParser().parse(filepath, metadata_only)
+    # Hand the timings over to the parent process
+    return filepath, parsed_file, Profiler.pop()
+
+def _generate(job):
+    content_object, directory = job
+    AssetManifest.pop_used()
+    output = Generator.generate(content_object, directory)
+    # Hand the assets used, the write and fragment cache stats, timings
+    # and files to compress over to the parent process
+    return (output, AssetManifest.pop_used(), Generator.pop_stats(),
+            FragmentCache.pop_stats(), Profiler.pop(), Compressor.pop_pending())
+
+class Workers(object):
+    """
+    Runs parsing and rendering in a pool of processes, or in this
+    process when jobs is 1. Results are always yielded in the order
+    of the input, so a parallel build is identical to a serial one.
+    """
+
+    # Items sent to a worker at a time when their number isn't known
+    LAZY_CHUNKSIZE = 8
+
+    def __init__(self, jobs=1):
+        if jobs < 1:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = jobs
+        self.pool = None
+        if jobs > 1:
+            self.pool = multiprocessing.Pool(jobs, _start)
+
+    def parse(self, filepaths, metadata_only=False):
+        """Yields (filepath, parsed Post, Page or None) for each of
+        filepaths, which may be a lazy iterable. With metadata_only
+        only the front matter of each file is read.
+        """
+        jobs = itertools.izip(filepaths, itertools.repeat(metadata_only))
+        for filepath, parsed_file, timings in self._map(_parse, jobs):
+            Profiler.merge(timings)
+            yield filepath, parsed_file
+
+    def generate(self, jobs):
+        """Generates each (content_object, directory) in jobs and yields
+        the path of each generated file and the assets it used, as
+        returned by AssetManifest.pop_used
+        """
+        for output, assets, stats, fragments, timings, pending in self._map(_generate, jobs):
+            Generator.add_stats(stats)
+            FragmentCache.add_stats(fragments)
+            Profiler.merge(timings)
+            Compressor.pending.extend(pending)
+            yield output, assets
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def _map(self, func, items):
+        if self.pool is None:
+            return itertools.imap(func, items)
+        # A few chunks per worker keeps scheduling overhead low while
+        # still balancing files of different size
+        try:
+            chunksize = max(1, len(items) // (self.jobs * 4))
+        except TypeError:
+            # A lazy iterable, consumed by the pool as it is mapped
+            chunksize = self.LAZY_CHUNKSIZE
+        return self.pool.imap(func, items, chunksize)
@@ -0,0 +1,105 @@
+import unittest
+import datetime
+import mock
+
+from racconto.generator import Generator
+from racconto.hooks import build_date_index, paginate, generate_paginated_blog_index
+from racconto.settings_manager import SettingsManager
+
+class PostMock(object):
+    def __init__(self, year, month, day):
+        self.date = datetime.datetime(year, month, day)
+
+class TestDateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.posts = [PostMock(2014, 1, 2),
+                      PostMock(2013, 12, 24),
+                      PostMock(2013, 12, 24),
+                      PostMock(2013, 2, 1),
+                      ]
+
+    def test_groups_posts_by_date_in_order(self):
+        archive = build_date_index(self.posts)
+        self.assertEqual(archive.keys(), ["2014", "2013"])
+        self.assertEqual(archive["2013"].keys(), ["12", "02"])
+        self.assertEqual(archive["2013"]["12"]["24"], self.posts[1:3])
+        self.assertEqual(archive["2014"]["01"]["02"], self.posts[0:1])
+
+    def test_empty(self):
+        self.assertEqual(build_date_index([]), {})
+
+class TestPaginate(unittest.TestCase):
+
+    def test_without_page_size_is_one_page(self):
+        pages = list(paginate(range(5), None, "site/2013", "/2013/"))
+        self.assertEqual(len(pages), 1)
+        directory, arguments = pages[0]
+        self.assertEqual(directory, "site/2013")
+        self.assertEqual(arguments["post_list"], range(5))
+        self.assertEqual(arguments["next_url"], None)
+
+    def test_anchored_pages(self):
+        pages = list(paginate(range(5), 2, "site", "/", True))
+        self.assertEqual([(directory, arguments["post_list"], arguments["page"])
+                          for directory, arguments in pages],
+                         [("site", [0, 1], 3), ("site/page/2", [1, 2], 2),
+                          ("site/page/1", [3, 4], 1)])
+        self.assertEqual(pages[0][1]["next_url"], "/page/2/")
+        self.assertEqual(pages[2][1]["previous_url"], "/page/2/")
+        self.assertFalse("pages" in pages[0][1])
+        # The first page is always full
+        pages = list(paginate(range(12), 5, "site", "/", True))
+        self.assertEqual([arguments["post_list"] for directory, arguments in pages],
+                         [range(5), range(2, 7), range(7, 12)])
+
+    def test_pages(self):
+        pages = list(paginate(range(5), 2, "site/2013", "/2013/"))
+        self.assertEqual([directory for directory, arguments in pages],
+                         ["site/2013", "site/2013/page/2", "site/2013/page/3"])
+        directory, arguments = pages[1]
+        self.assertEqual(arguments["post_list"], [2, 3])
+        self.assertEqual(arguments["page"], 2)
+        self.assertEqual(arguments["pages"], 3)
+        self.assertEqual(arguments["previous_url"], "/2013/")
+        self.assertEqual(arguments["next_url"], "/2013/page/3/")
+
+class TestPaginatedBlogIndex(unittest.TestCase):
+
+    def setUp(self):
+        self._generate_index_file = Generator.generate_index_file
+        Generator.generate_index_file = mock.Mock()
+        SettingsManager.settings['BLOG_INDEX_PAGE_SIZE'] = 2
+
+    def tearDown(self):
+        Generator.generate_index_file = self._generate_index_file
+        SettingsManager.override(None)
+
+    def test_renders_each_page_from_its_slice(self):
+        posts = [PostMock(2013, 1, day) for day in range(5, 0, -1)]
+        generate_paginated_blog_index([], posts)
+        calls = Generator.generate_index_file.call_args_list
+        self.assertEqual([call[0][0] for call in calls],
+                         ["site", "site/page/2", "site/page/1"])
+        self.assertEqual(calls[0][0][2], posts[:2])
+        self.assertEqual(calls[2][0][2], posts[3:])
+        self.assertEqual(calls[1][1]["previous_url"], "/")
+        self.assertEqual(calls[1][1]["next_url"], "/page/1/")
+
+    def test_new_post_only_changes_the_newest_pages(self):
+        def pages(count):
+            posts = [PostMock(2013, 1, day) for day in range(count, 0, -1)]
+            Generator.generate_index_file.reset_mock()
+            generate_paginated_blog_index([], posts)
+            return dict((call[0][0], ([post.date for post in call[0][2]],
+                                      call[1]["page"], call[1]["previous_url"],
+                                      call[1]["next_url"]))
+                        for call in Generator.generate_index_file.call_args_list)
+        def changed(before, after):
+            return sorted(directory for directory in after
+                          if before.get(directory) != after[directory])
+        self.assertEqual(changed(pages(9), pages(10)), ["site"])
+        self.assertEqual(len(pages(11)["site"][0]), 2)
+        # The full index moves to page 5, page 4 links to it
+        self.assertEqual(changed(pages(10), pages(11)),
+                         ["site", "site/page/4", "site/page/5"])
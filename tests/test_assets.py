@@ -0,0 +1,90 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from jinja2 import Environment
+
+from racconto.assets import AssetManifest, asset_url, asset_url_filter
+from racconto.static import file_hash
+import racconto.assets
+
+class TestAssetManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.static = os.path.join(self.directory, "static")
+        self.manifest_path = os.path.join(self.directory, "site", "manifest.json")
+        os.makedirs(os.path.join(self.static, "css"))
+        self._write("css/app.css", "body {}")
+        self._write("favicon.ico", "icon")
+        self._file_hash = racconto.assets.file_hash
+        self.hashed = []
+
+    def tearDown(self):
+        racconto.assets.file_hash = self._file_hash
+        AssetManifest.reset()
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, data):
+        f = open(os.path.join(self.static, path), 'w')
+        f.write(data)
+        f.close()
+
+    def _update(self):
+        AssetManifest.update(self.static, self.manifest_path, ["favicon.ico"])
+
+    def _count_hashing(self):
+        def counting_file_hash(path):
+            self.hashed.append(path)
+            return file_hash(path)
+        racconto.assets.file_hash = counting_file_hash
+
+    def test_fingerprinted_names(self):
+        self._update()
+        digest = file_hash(os.path.join(self.static, "css/app.css"))
+        self.assertEqual(AssetManifest.fingerprints(),
+                         {"css/app.css": "css/app.%s.css" % digest[:10]})
+        self.assertEqual(asset_url("css/app.css"), "/static/css/app.%s.css" % digest[:10])
+        self.assertEqual(asset_url("/missing.js"), "/static/missing.js")
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+    def test_only_changed_files_are_hashed(self):
+        self._update()
+        fingerprints = AssetManifest.fingerprints()
+        # Load the stored manifest again, as in a new build
+        AssetManifest.reset()
+        self._count_hashing()
+        self._update()
+        self.assertEqual(self.hashed, [])
+        self.assertEqual(AssetManifest.fingerprints(), fingerprints)
+        self._write("css/app.css", "body { color: red }")
+        self._update()
+        self.assertEqual(len(self.hashed), 1)
+        self.assertNotEqual(AssetManifest.fingerprints(), fingerprints)
+
+    def test_filter_is_resolved_when_rendering(self):
+        env = Environment()
+        env.filters["asset_url"] = asset_url_filter
+        template = env.from_string(u'{{ "css/app.css"|asset_url }}')
+        self.assertEqual(template.render(), u"/static/css/app.css")
+        self._update()
+        self.assertNotEqual(template.render(), u"/static/css/app.css")
+        self.assertEqual(AssetManifest.pop_used().keys(), ["css/app.css"])
+
+    def test_used_assets_changed(self):
+        self._update()
+        AssetManifest.pop_used()
+        asset_url("css/app.css")
+        asset_url("/js/missing.js")
+        used = AssetManifest.pop_used()
+        self.assertEqual(sorted(used), ["css/app.css", "js/missing.js"])
+        self.assertEqual(AssetManifest.pop_used(), {})
+        self.assertFalse(AssetManifest.changed(used))
+        self._write("favicon.ico", "other icon")
+        self._update()
+        self.assertFalse(AssetManifest.changed(used))
+        self._write("css/app.css", "body { color: red }")
+        self._update()
+        self.assertTrue(AssetManifest.changed(used))
+        self.assertFalse(AssetManifest.changed({}))
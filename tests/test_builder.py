@@ -0,0 +1,158 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto import hooks
+from racconto.builder import SiteBuilder
+from racconto.hooks.manager import HooksManager
+from racconto.settings_manager import SettingsManager
+
+class TestIncrementalBuild(unittest.TestCase):
+    """Builds a small site in a temporary directory twice, as two runs
+    of python -m racconto --generate would
+    """
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        SettingsManager.override(None)
+        self.hooks = [HooksManager.before_all_hooks, HooksManager.after_all_hooks,
+                      HooksManager.before_each_hooks, HooksManager.after_each_hooks]
+        HooksManager.before_all_hooks, HooksManager.after_all_hooks = [], []
+        HooksManager.before_each_hooks, HooksManager.after_each_hooks = [], []
+        os.makedirs("content")
+        os.makedirs("templates")
+        self._write("templates/post.j2", u"{{ title }} {{ body }}")
+        self._write("templates/page.j2", u"{{ title }} {{ site.counts.posts }} posts {{ body }}")
+        self._write("templates/index.j2", u"{% for p in post_list %}{{ p.title }},{% endfor %}")
+        for day in (1, 2, 3):
+            self._write("content/2013-01-0%d-post-%d.md" % (day, day),
+                        self._post(day, u"Text %d" % day))
+        self._write("content/about.md", u"---\ntitle: About\n---\nAbout \u00e5\n")
+
+    def tearDown(self):
+        (HooksManager.before_all_hooks, HooksManager.after_all_hooks,
+         HooksManager.before_each_hooks, HooksManager.after_each_hooks) = self.hooks
+        SettingsManager.override(None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, text):
+        f = open(path, 'wb')
+        f.write(text.encode('utf-8'))
+        f.close()
+
+    def _post(self, day, text):
+        return u"---\ntitle: Post %d\ntemplate: post.j2\n---\n%s\n" % (day, text)
+
+    def _read(self, path):
+        f = open(path, 'rb')
+        try:
+            return f.read().decode('utf-8')
+        finally:
+            f.close()
+
+    def _build(self, jobs=1):
+        return SiteBuilder(jobs, cache=False).build()
+
+    def _site(self):
+        """Returns {path: content} of the generated files """
+        files = {}
+        for root, dirs, names in os.walk("site"):
+            for name in names:
+                path = os.path.join(root, name)
+                files[path] = self._read(path)
+        return files
+
+    def test_unchanged_sources_are_skipped(self):
+        self.assertEqual(self._build(), {"sources": 4, "generated": 4})
+        self.assertEqual(self._read("site/2013/01/02/post-2/index.html"),
+                         u"Post 2 <p>Text 2</p>\n")
+        self.assertEqual(self._build(), {"sources": 4, "generated": 0})
+        self._write("content/2013-01-02-post-2.md", self._post(2, u"Changed"))
+        # and the page using the site global
+        self.assertEqual(self._build(), {"sources": 4, "generated": 2})
+        self.assertEqual(self._read("site/2013/01/02/post-2/index.html"),
+                         u"Post 2 <p>Changed</p>\n")
+
+    def test_removed_source_output_is_deleted(self):
+        self._build()
+        self.assertTrue(os.path.exists("site/2013/01/03/post-3/index.html"))
+        os.remove("content/2013-01-03-post-3.md")
+        self._build()
+        self.assertFalse(os.path.exists("site/2013/01/03/post-3/index.html"))
+        self.assertFalse(os.path.exists("site/2013/01/03"))
+        self.assertTrue(os.path.exists("site/2013/01/02/post-2/index.html"))
+
+    def test_template_change_renders_only_its_dependents(self):
+        self._build()
+        self._write("templates/post.j2", u"<h1>{{ title }}</h1>{{ body }}")
+        self.assertEqual(self._build(), {"sources": 4, "generated": 3})
+        self.assertEqual(self._read("site/2013/01/01/post-1/index.html"),
+                         u"<h1>Post 1</h1><p>Text 1</p>\n")
+        self._write("templates/page.j2", u"{{ title }}")
+        self.assertEqual(self._build(), {"sources": 4, "generated": 1})
+        self.assertEqual(self._read("site/about/index.html"), u"About")
+
+    def test_global_change_renders_content_using_it(self):
+        self._build()
+        self.assertEqual(self._read("site/about/index.html"),
+                         u"About 3 posts <p>About \u00e5</p>\n")
+        # A new post changes the site global the page template uses,
+        # the other posts don't use it
+        self._write("content/2013-01-04-post-4.md", self._post(4, u"Text 4"))
+        self.assertEqual(self._build(), {"sources": 5, "generated": 2})
+        self.assertEqual(self._read("site/about/index.html"),
+                         u"About 4 posts <p>About \u00e5</p>\n")
+
+    def test_missing_aggregate_output_is_generated_again(self):
+        HooksManager.register_after_all_hook(hooks.generate_paginated_blog_index)
+        self._build()
+        self.assertEqual(self._read("site/index.html"), u"Post 3,Post 2,Post 1,")
+        shutil.rmtree("site")
+        self.assertEqual(self._build(), {"sources": 4, "generated": 4})
+        self.assertEqual(self._read("site/index.html"), u"Post 3,Post 2,Post 1,")
+
+    def test_new_aggregate_hook_runs(self):
+        self._build()
+        HooksManager.register_after_all_hook(hooks.generate_paginated_blog_index)
+        self.assertEqual(self._build(), {"sources": 4, "generated": 0})
+        self.assertEqual(self._read("site/index.html"), u"Post 3,Post 2,Post 1,")
+
+    def test_taxonomies_are_built_again_by_the_same_builder(self):
+        # As the dev server does, without build_taxonomies registered
+        SettingsManager.settings["TAXONOMIES"] = ["tags"]
+        HooksManager.register_after_all_hook(hooks.generate_taxonomy_pages)
+        self._write("templates/taxonomy_index.j2",
+                    u"{% for term in taxonomy %}{{ term.name }},{% endfor %}")
+        self._write("templates/taxonomy.j2", u"{{ name }}")
+        self._write("content/2013-01-02-post-2.md",
+                    u"---\ntitle: Post 2\ntags: [python]\n---\nText\n")
+        builder = SiteBuilder(1, cache=False)
+        builder.build()
+        self.assertEqual(self._read("site/tags/index.html"), u"python,")
+        self._write("content/2013-01-02-post-2.md",
+                    u"---\ntitle: Post 2\ntags: [rust]\n---\nText\n")
+        builder.build()
+        self.assertEqual(self._read("site/tags/index.html"), u"rust,")
+        self.assertEqual(self._read("site/tags/rust/index.html"), u"rust")
+
+    def test_changed_settings_render_everything(self):
+        self._build()
+        SettingsManager.settings["MARKDOWN_EXTRAS"] = ["fenced-code-blocks", "footnotes"]
+        self.assertEqual(self._build(), {"sources": 4, "generated": 4})
+
+    def test_parallel_build_is_identical_to_serial_build(self):
+        self._build()
+        serial = self._site()
+        shutil.rmtree("site")
+        os.remove(SettingsManager.get('MANIFEST_FILE'))
+        self.assertEqual(self._build(jobs=2), {"sources": 4, "generated": 4})
+        self.assertEqual(self._site(), serial)
+        self.assertEqual(len(serial), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto.cache import MarkdownCache
+
+class TestMarkdownCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        MarkdownCache.setup(self.directory, 1024)
+
+    def tearDown(self):
+        MarkdownCache.setup(None)
+        shutil.rmtree(self.directory)
+
+    def test_disabled_cache_has_no_keys(self):
+        MarkdownCache.setup(None)
+        self.assertEqual(MarkdownCache.key(u"text", []), None)
+        self.assertEqual(MarkdownCache.get(None), None)
+
+    def test_key_depends_on_extras(self):
+        self.assertNotEqual(MarkdownCache.key(u"text", []),
+                            MarkdownCache.key(u"text", ["fenced-code-blocks"]))
+        self.assertEqual(MarkdownCache.key(u"text", ["a", "b"]),
+                         MarkdownCache.key(u"text", ["b", "a"]))
+
+    def test_set_and_get(self):
+        key = MarkdownCache.key(u"*text*", [])
+        self.assertEqual(MarkdownCache.get(key), None)
+        MarkdownCache.set(key, u"<p><em>text</em> \u00e5</p>")
+        self.assertEqual(MarkdownCache.get(key), u"<p><em>text</em> \u00e5</p>")
+
+    def test_prune_evicts_least_recently_used(self):
+        keys = [MarkdownCache.key(u"text %d" % i, []) for i in range(3)]
+        for index, key in enumerate(keys):
+            MarkdownCache.set(key, u"x" * 500)
+            path = MarkdownCache._path(key)
+            os.utime(path, (index, index))
+        MarkdownCache.prune()
+        self.assertEqual(MarkdownCache.get(keys[0]), None)
+        self.assertEqual(MarkdownCache.get(keys[1]), u"x" * 500)
+        self.assertEqual(MarkdownCache.get(keys[2]), u"x" * 500)
@@ -0,0 +1,53 @@
+import unittest
+import gzip
+import os
+import shutil
+import tempfile
+
+from racconto.compress import Compressor
+
+class TestCompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "index.html")
+        self._write(self.path, "<p>%s</p>" % ("content " * 100))
+        Compressor.setup(True, 100, [".html"])
+        Compressor.pop_pending()
+
+    def tearDown(self):
+        Compressor.setup(False, 0, [])
+        Compressor.pop_pending()
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, data):
+        f = open(path, 'w')
+        f.write(data)
+        f.close()
+
+    def test_compresses_queued_files(self):
+        Compressor.queue(self.path)
+        self.assertEqual(Compressor.run(), 1)
+        f = gzip.open(self.path + ".gz")
+        self.assertEqual(f.read(), "<p>%s</p>" % ("content " * 100))
+        f.close()
+
+    def test_unchanged_files_are_not_compressed_again(self):
+        Compressor.queue(self.path)
+        Compressor.run()
+        Compressor.queue(self.path, False)
+        self.assertEqual(Compressor.run(), 0)
+
+    def test_other_and_small_files_are_not_compressed(self):
+        other = os.path.join(self.directory, "image.png")
+        self._write(other, "x" * 1000)
+        Compressor.queue(other)
+        small = os.path.join(self.directory, "small.html")
+        self._write(small, "<p></p>")
+        Compressor.queue(small)
+        self.assertEqual(Compressor.pending, [])
+
+    def test_disabled(self):
+        Compressor.setup(False, 100, [".html"])
+        Compressor.queue(self.path)
+        self.assertEqual(Compressor.pending, [])
@@ -0,0 +1,52 @@
+import unittest
+import datetime
+
+from jinja2 import Environment
+
+from racconto.context import SiteContext, FrozenDict, freeze
+
+class PostMock(object):
+    def __init__(self, title, year, month, day):
+        self.title = title
+        self.date = datetime.datetime(year, month, day)
+        self.source = "content/%s.md" % title
+
+class TestSiteContext(unittest.TestCase):
+
+    def setUp(self):
+        self.posts = [PostMock("c", 2014, 1, 2), PostMock("b", 2013, 12, 24),
+                      PostMock("a", 2013, 2, 1)]
+        self.site = SiteContext([], self.posts, {"SITE_TITLE": "Site"},
+                                {"content/a.md": "1"})
+
+    def test_collections(self):
+        self.assertEqual(self.site.posts, tuple(self.posts))
+        self.assertEqual(self.site.recent_posts(2), tuple(self.posts[:2]))
+        self.assertEqual(self.site.archive.keys(), ["2014", "2013"])
+        self.assertEqual(self.site.archive["2013"]["12"]["24"], (self.posts[1],))
+        self.assertEqual(dict(self.site.counts["years"]), {"2014": 1, "2013": 2})
+
+    def test_is_read_only(self):
+        def assign():
+            self.site.archive["2015"] = {}
+        self.assertRaises(TypeError, assign)
+        self.assertFalse(hasattr(self.site.posts, "append"))
+
+    def test_templates_read_it(self):
+        template = Environment().from_string(
+            "{{ site.counts.posts }} {{ site.settings.SITE_TITLE }} "
+            "{% for post in site.recent_posts(1) %}{{ post.title }}{% endfor %}")
+        self.assertEqual(template.render(site=self.site), "3 Site c")
+
+    def test_digest_changes_with_content(self):
+        same = SiteContext([], self.posts, {}, {"content/a.md": "1"})
+        changed = SiteContext([], self.posts, {}, {"content/a.md": "2"})
+        reordered = SiteContext([], self.posts[::-1], {}, {"content/a.md": "1"})
+        self.assertEqual(same.digest, self.site.digest)
+        self.assertNotEqual(changed.digest, self.site.digest)
+        self.assertNotEqual(reordered.digest, self.site.digest)
+
+    def test_freeze(self):
+        frozen = freeze({"a": [1, {"b": 2}]})
+        self.assertEqual(frozen["a"][1]["b"], 2)
+        self.assertTrue(isinstance(frozen["a"][1], FrozenDict))
@@ -0,0 +1,58 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto import discovery
+from racconto.discovery import discover, compile_ignore_patterns
+
+class TestDiscover(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        for path in ("content/about.md",
+                     "content/2013/2013-01-01-a.md",
+                     "content/2013/2013-02-01-b.md",
+                     "content/2014/drafts/2014-01-01-c.md",
+                     "content/2014/2014-01-01-d.md~",
+                     "content/.2014-01-01-e.md",
+                     "content/notes.txt"):
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            f = open(path, 'w')
+            f.write("content")
+            f.close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def _paths(self, ignore_patterns=()):
+        return [path for path, stat in discover("content", ignore_patterns=ignore_patterns)]
+
+    def test_walks_recursively_in_sorted_order(self):
+        self.assertEqual(self._paths(), ["./content/about.md",
+                                         "./content/2013/2013-01-01-a.md",
+                                         "./content/2013/2013-02-01-b.md",
+                                         "./content/2014/drafts/2014-01-01-c.md"])
+
+    def test_ignore_patterns(self):
+        self.assertEqual(self._paths(["2014/drafts", "*-b.md"]),
+                         ["./content/about.md", "./content/2013/2013-01-01-a.md"])
+
+    def test_entries_come_with_their_stat(self):
+        path, stat = next(discover("content"))
+        self.assertEqual(stat.st_size, len("content"))
+
+    def test_without_scandir(self):
+        scandir = discovery.scandir
+        discovery.scandir = None
+        try:
+            self.assertEqual(len(self._paths()), 4)
+        finally:
+            discovery.scandir = scandir
+
+    def test_no_ignore_patterns(self):
+        self.assertEqual(compile_ignore_patterns([]), None)
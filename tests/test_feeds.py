@@ -0,0 +1,82 @@
+import unittest
+import datetime
+import os
+import shutil
+import tempfile
+from xml.dom import minidom
+
+from racconto.feeds import atom_feed, sitemap
+from racconto.generator import Generator
+from racconto.hooks import generate_feed, generate_sitemap
+from racconto.settings_manager import SettingsManager
+
+class PostMock(object):
+    def __init__(self, number):
+        self.title = "Post <%d>" % number
+        self.date = datetime.datetime(2013, 1, number)
+        self.filepath = "2013/01/%02d/post-%d" % (number, number)
+        self.source = "content/2013-01-%02d-post-%d.md" % (number, number)
+        self.body = "<p>%d & more</p>" % number
+
+class TestFeeds(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        SettingsManager.settings["SITEDIR"] = self.directory
+        SettingsManager.settings["BLOGDIR"] = self.directory
+        SettingsManager.settings["SITE_URL"] = "http://example.com/"
+        self.manifest = Generator.manifest
+        Generator.manifest = None
+        self.posts = [PostMock(number) for number in range(5, 0, -1)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        SettingsManager.override(None)
+        Generator.manifest = self.manifest
+
+    def _parse(self, name):
+        return minidom.parse(os.path.join(self.directory, name))
+
+    def test_sitemap(self):
+        generate_sitemap([], self.posts)
+        locs = [node.firstChild.data for node in
+                self._parse("sitemap.xml").getElementsByTagName("loc")]
+        self.assertEqual(locs[:2], ["http://example.com/",
+                                    "http://example.com/2013/01/05/post-5/"])
+        self.assertEqual(len(locs), 6)
+
+    def test_large_sitemap_is_split(self):
+        SettingsManager.settings["SITEMAP_MAX_URLS"] = 4
+        generate_sitemap([], self.posts)
+        locs = [node.firstChild.data for node in
+                self._parse("sitemap.xml").getElementsByTagName("loc")]
+        self.assertEqual(locs, ["http://example.com/sitemap-1.xml",
+                                "http://example.com/sitemap-2.xml"])
+        self.assertEqual(len(self._parse("sitemap-1.xml").getElementsByTagName("url")), 4)
+        self.assertEqual(len(self._parse("sitemap-2.xml").getElementsByTagName("url")), 2)
+
+    def test_feed_has_latest_posts(self):
+        SettingsManager.settings["FEED_SIZE"] = 2
+        generate_feed([], self.posts)
+        entries = self._parse("feed.xml").getElementsByTagName("entry")
+        self.assertEqual(len(entries), 2)
+        title = entries[0].getElementsByTagName("title")[0].firstChild.data
+        content = entries[0].getElementsByTagName("content")[0].firstChild.data
+        self.assertEqual((title, content), ("Post <5>", "<p>5 & more</p>"))
+
+    def test_feed_with_number_titles(self):
+        SettingsManager.settings["SITE_TITLE"] = 2013
+        SettingsManager.settings["SITE_AUTHOR"] = 42
+        self.posts[0].title = 1984
+        generate_feed([], self.posts)
+        feed = self._parse("feed.xml")
+        titles = [node.firstChild.data for node in feed.getElementsByTagName("title")]
+        self.assertEqual(titles[:2], ["2013", "1984"])
+        self.assertEqual(feed.getElementsByTagName("name")[0].firstChild.data, "42")
+
+    def test_xml_is_yielded_in_chunks(self):
+        chunks = list(sitemap([("http://example.com/%d" % i, 0) for i in range(3)]))
+        self.assertEqual(len(chunks), 5)
+        feed = "".join(atom_feed("t", "http://example.com/", "http://example.com/feed.xml",
+                                 "a", []))
+        self.assertEqual(minidom.parseString(feed).getElementsByTagName("entry"), [])
@@ -0,0 +1,38 @@
+import unittest
+from datetime import datetime
+
+from racconto.filenames import FilenameClassifier
+
+class TestFilenameClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = FilenameClassifier(["YYYY-MM-DD-slug", "YYYY/MM/slug"])
+
+    def test_dated_filename_is_post(self):
+        self.assertEqual(self.classifier.classify("./content/2013-12-11-a-post.md"),
+                         ("post", datetime(2013, 12, 11), "a-post"))
+
+    def test_nested_filename_is_post(self):
+        self.assertEqual(self.classifier.classify("content/2013/12/a-post.md"),
+                         ("post", datetime(2013, 12, 1), "a-post"))
+
+    def test_other_filenames_are_pages(self):
+        self.assertEqual(self.classifier.classify("./content/about.md"),
+                         ("page", None, "about"))
+        self.assertEqual(self.classifier.classify("content/x2013-12-11-a.md"),
+                         ("page", None, "x2013-12-11-a"))
+        self.assertEqual(self.classifier.classify("path/to/page"),
+                         ("page", None, "page"))
+
+    def test_invalid_dates_are_pages(self):
+        self.assertEqual(self.classifier.classify("2013-02-29-a.md")[0], "page")
+        self.assertEqual(self.classifier.classify("2013-13-01-a.md")[0], "page")
+        self.assertEqual(self.classifier.classify("2012-02-29-a.md"),
+                         ("post", datetime(2012, 2, 29), "a"))
+
+    def test_slug_ends_at_first_dot(self):
+        self.assertEqual(self.classifier.classify("2013-12-11-a.b.md")[2], "a")
+
+    def test_pattern_must_end_with_slug(self):
+        self.assertRaises(ValueError, FilenameClassifier, ["slug-YYYY"])
+        self.assertRaises(ValueError, FilenameClassifier, ["MM-slug"])
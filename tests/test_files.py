@@ -0,0 +1,47 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto.files import atomic_write, makedirs
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "a", "b", "file.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read(self):
+        f = open(self.path, 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_writes_and_replaces(self):
+        with atomic_write(self.path) as f:
+            f.write("one")
+        with atomic_write(self.path) as f:
+            f.write("two")
+        self.assertEqual(self._read(), "two")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["file.txt"])
+
+    def test_failed_write_leaves_the_file_alone(self):
+        with atomic_write(self.path) as f:
+            f.write("one")
+        try:
+            with atomic_write(self.path) as f:
+                f.write("partial")
+                raise IOError("disk full")
+        except IOError:
+            pass
+        self.assertEqual(self._read(), "one")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["file.txt"])
+
+    def test_makedirs_tolerates_existing_directories(self):
+        makedirs(os.path.join(self.directory, "a"))
+        makedirs(os.path.join(self.directory, "a"))
+        self.assertTrue(os.path.isdir(os.path.join(self.directory, "a")))
@@ -0,0 +1,119 @@
+import unittest
+import shutil
+import tempfile
+
+from jinja2 import DictLoader, Environment
+
+from racconto.assets import AssetManifest, asset_url
+from racconto.fragments import FragmentCache, FragmentCacheExtension, describe
+
+class Counter(object):
+    """Counts how many times the fragment body is rendered """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment(loader=DictLoader({
+            "page.j2": u'{% cache "nav", key %}<nav>{{ count() }}</nav>{% endcache %}'
+                       u'<p>{{ title }}</p>',
+            "two.j2": u'{% cache "a" %}{{ count() }}{% endcache %}'
+                      u'{% cache "a" %}{{ count() }}{% endcache %}',
+            "asset.j2": u'{% cache "css" %}{{ count() }} {{ asset_url("app.css") }}{% endcache %}',
+            }), extensions=[FragmentCacheExtension])
+        self.env.globals["asset_url"] = asset_url
+        FragmentCache.start()
+        FragmentCache.pop_stats()
+        self.count = Counter()
+
+    def tearDown(self):
+        AssetManifest.reset()
+        FragmentCache.setup(None)
+        FragmentCache.start()
+        FragmentCache.pop_stats()
+
+    def render(self, name, **context):
+        return self.env.get_template(name).render(count=self.count, **context)
+
+    def test_fragment_is_rendered_once_per_inputs(self):
+        self.assertEqual(self.render("page.j2", key=1, title=u"a"), u"<nav>1</nav><p>a</p>")
+        self.assertEqual(self.render("page.j2", key=1, title=u"b"), u"<nav>1</nav><p>b</p>")
+        self.assertEqual(self.render("page.j2", key=2, title=u"c"), u"<nav>2</nav><p>c</p>")
+        self.assertEqual(FragmentCache.pop_stats(), {"hits": 1, "misses": 2})
+
+    def test_fragments_with_the_same_inputs_are_distinct(self):
+        self.assertEqual(self.render("two.j2"), u"12")
+
+    def test_start_forgets_fragments(self):
+        self.render("page.j2", key=1)
+        FragmentCache.start()
+        self.render("page.j2", key=1)
+        self.assertEqual(self.count.calls, 2)
+
+    def test_keys_cover_the_template_sources(self):
+        digests = {"page.j2": "one"}
+        FragmentCache.start("settings", lambda name: digests[name])
+        key = FragmentCache.key("page.j2", 1, [u"nav"])
+        digests["page.j2"] = "two"
+        self.assertNotEqual(FragmentCache.key("page.j2", 1, [u"nav"]), key)
+        FragmentCache.start("other settings", lambda name: digests[name])
+        self.assertNotEqual(FragmentCache.key("page.j2", 1, [u"nav"]), key)
+
+    def test_fragments_persist_between_builds(self):
+        directory = tempfile.mkdtemp()
+        try:
+            FragmentCache.setup(directory)
+            self.render("page.j2", key=u"\u00e5")
+            FragmentCache.start()
+            self.assertEqual(self.render("page.j2", key=u"\u00e5"), u"<nav>1</nav><p></p>")
+            self.assertEqual(self.count.calls, 1)
+            self.assertEqual(FragmentCache.pop_stats(), {"hits": 1, "misses": 1})
+        finally:
+            shutil.rmtree(directory)
+
+    def test_fragment_linking_to_changed_asset_is_rendered_again(self):
+        directory = tempfile.mkdtemp()
+        try:
+            FragmentCache.setup(directory)
+            AssetManifest.assets = {"app.css": {"fingerprinted": "app.1.css"}}
+            self.assertEqual(self.render("asset.j2"), u"1 /static/app.1.css")
+            FragmentCache.start()
+            AssetManifest.pop_used()
+            self.assertEqual(self.render("asset.j2"), u"1 /static/app.1.css")
+            # Assets used by a cached fragment are used by the page
+            self.assertEqual(AssetManifest.pop_used(), {"app.css": "app.1.css"})
+            AssetManifest.assets = {"app.css": {"fingerprinted": "app.2.css"}}
+            self.assertEqual(self.render("asset.j2"), u"2 /static/app.2.css")
+        finally:
+            shutil.rmtree(directory)
+
+    def test_hit_rate(self):
+        self.assertEqual(FragmentCache.hit_rate({"hits": 3, "misses": 1}), 75.0)
+        self.assertEqual(FragmentCache.hit_rate({"hits": 0, "misses": 0}), 0.0)
+
+class TestDescribe(unittest.TestCase):
+
+    def test_strings_are_described_alike(self):
+        self.assertEqual(describe("nav"), describe(u"nav"))
+        self.assertNotEqual(describe("1"), describe(1))
+
+    def test_sequences(self):
+        self.assertEqual(describe([u"a", 1, None]), describe((u"a", 1, None)))
+        self.assertNotEqual(describe([u"a", u"b"]), describe([u"a', 'b"]))
+
+    def test_digests(self):
+        class Site(object):
+            digest = "abc"
+        class Taxonomy(object):
+            def digest(self):
+                return "abc"
+        self.assertEqual(describe(Site()), describe(Taxonomy()))
+
+    def test_objects_without_digest_are_refused(self):
+        self.assertRaises(TypeError, describe, object())
@@ -0,0 +1,58 @@
+import unittest
+
+import yaml
+
+from racconto.frontmatter import FrontMatter
+
+class TestFrontMatter(unittest.TestCase):
+
+    def setUp(self):
+        FrontMatter.cache = {}
+
+    def assertSameAsYaml(self, text):
+        self.assertEqual(FrontMatter.load(text), yaml.safe_load(text))
+
+    def test_flat_front_matter_skips_yaml(self):
+        text = u"title: Hello, world\nlayout: post\ncount: 12\n"
+        self.assertNotEqual(FrontMatter._load_flat(text), None)
+        self.assertSameAsYaml(text)
+        self.assertEqual(type(FrontMatter.load(text)["title"]), str)
+
+    def test_flat_front_matter_same_as_yaml(self):
+        for text in (u"title: Don't stop\n",
+                     u"title: R\u00e4ksm\u00f6rg\u00e5s\n",
+                     u"url: http://example.com/#top\n",
+                     u"title: True story  \n\nn: -5\n",
+                     u"title: a\ntitle: b\n"):
+            self.assertSameAsYaml(text)
+
+    def test_other_front_matter_goes_through_yaml(self):
+        for text in (u"title: 'quoted'\n",
+                     u"draft: yes\n",
+                     u"published: Off\n",
+                     u"date: 2013-01-01\n",
+                     u"version: 1.5\n",
+                     u"mode: 0755\n",
+                     u"title: value # comment\n",
+                     u"tags: [a, b]\n",
+                     u"tags:\n  - a\n  - b\n",
+                     u"true: key\n",
+                     u"nothing: ~\n",
+                     u"# comment\ntitle: x\n",
+                     u""):
+            self.assertEqual(FrontMatter._load_flat(text), None, text)
+            self.assertSameAsYaml(text)
+
+    def test_invalid_front_matter_raises(self):
+        for text in (u"title: part 1: the start\n", u"title: empty:\n"):
+            self.assertRaises(yaml.YAMLError, FrontMatter.load, text)
+
+    def test_unsafe_tags_are_rejected(self):
+        self.assertRaises(yaml.YAMLError, FrontMatter.load,
+                          u"title: !!python/object/apply:os.system ['true']\n")
+
+    def test_cached_front_matter_is_copied(self):
+        text = u"tags: [a, b]\n"
+        FrontMatter.load(text)["tags"].append("c")
+        self.assertEqual(FrontMatter.load(text), {"tags": ["a", "b"]})
+        self.assertEqual(len(FrontMatter.cache), 1)
@@ -0,0 +1,149 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto.generator import Generator, PrecompiledLoader
+from racconto.parsers import RaccontoParser
+from racconto.settings_manager import SettingsManager
+
+class TestWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "index.html")
+        Generator.pop_stats()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_creates_file(self):
+        self.assertTrue(Generator.write(self.path, u"<p>\u00e5</p>"))
+        self.assertEqual(Generator._read(self.path), "<p>\xc3\xa5</p>")
+        self.assertEqual(os.listdir(self.directory), ["index.html"])
+
+    def test_unchanged_output_is_not_written(self):
+        Generator.write(self.path, u"<p>content</p>")
+        os.utime(self.path, (0, 0))
+        self.assertFalse(Generator.write(self.path, u"<p>content</p>"))
+        self.assertEqual(os.path.getmtime(self.path), 0)
+        self.assertEqual(Generator.pop_stats(), {"written": 1, "skipped": 1})
+
+    def test_changed_output_is_written(self):
+        Generator.write(self.path, u"<p>content</p>")
+        self.assertTrue(Generator.write(self.path, u"<p>contents</p>"))
+        self.assertTrue(Generator.write(self.path, u"<p>Content</p>"))
+        self.assertEqual(Generator._read(self.path), "<p>Content</p>")
+
+class TestTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.templates = os.path.join(self.directory, "templates")
+        self.compiled = os.path.join(self.directory, "compiled")
+        self.bytecode = os.path.join(self.directory, "bytecode")
+        os.makedirs(self.templates)
+        self._write_template("page.j2", "compiled {{ title }}")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_template(self, name, source, mtime=None):
+        path = os.path.join(self.templates, name)
+        f = open(path, 'w')
+        f.write(source)
+        f.close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def _render(self):
+        Generator.setup_jinja_environment(self.templates, self.bytecode, self.compiled)
+        return Generator.jinja_env.get_template("page.j2").render(title="a")
+
+    def test_bytecode_cache(self):
+        self.assertEqual(self._render(), "compiled a")
+        self.assertEqual(len(os.listdir(self.bytecode)), 1)
+
+    def test_precompiled_templates_are_used(self):
+        Generator.setup_jinja_environment(self.templates)
+        self.assertEqual(Generator.compile_templates(self.compiled), 1)
+        # Older source, the compiled template is used
+        self._write_template("page.j2", "source {{ title }}", 0)
+        self.assertEqual(self._render(), "compiled a")
+        self.assertTrue(isinstance(Generator.jinja_env.loader, PrecompiledLoader))
+
+    def test_modified_templates_are_loaded_from_source(self):
+        Generator.setup_jinja_environment(self.templates)
+        Generator.compile_templates(self.compiled)
+        self._write_template("page.j2", "source {{ title }}", 2 ** 31 - 1)
+        self.assertEqual(self._render(), "source a")
+
+    def test_reload_templates(self):
+        self.assertEqual(self._render(), "compiled a")
+        self._write_template("page.j2", "changed {{ title }}")
+        self.assertEqual(Generator.jinja_env.get_template("page.j2").render(title="a"),
+                         "compiled a")
+        Generator.reload_templates()
+        self.assertEqual(Generator.jinja_env.get_template("page.j2").render(title="a"),
+                         "changed a")
+
+class TestStreamedBody(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spill = os.path.join(self.directory, "spill")
+        os.makedirs(self.spill)
+        templates = os.path.join(self.directory, "templates")
+        os.makedirs(templates)
+        for name, source in (("base.j2", "<html>{% block body %}{% endblock %}</html>"),
+                             ("page.j2", "{% extends 'base.j2' %}{% block body %}"
+                                         "<h1>{{ title }}</h1>{{ body }}<p>{{ body }}</p>"
+                                         "{% endblock %}")):
+            f = open(os.path.join(templates, name), 'w')
+            f.write(source)
+            f.close()
+        self.source = os.path.join(self.directory, "large.md")
+        f = open(self.source, 'wb')
+        f.write(u"---\ntitle: Large\n---\n# Part 1\n\n\u00e5\n\n# Part 2\n\ntext\n".encode('utf-8'))
+        f.close()
+        Generator.setup_jinja_environment(templates)
+        SettingsManager.settings["LARGE_FILE_SPILL_DIR"] = self.spill
+
+    def tearDown(self):
+        SettingsManager.override(None)
+        shutil.rmtree(self.directory)
+
+    def _generate(self, large_file_size):
+        SettingsManager.settings["LARGE_FILE_SIZE"] = large_file_size
+        page = RaccontoParser().parse(self.source, True)
+        path = Generator.generate(page, os.path.join(self.directory, "site"))
+        return Generator._read(path)
+
+    def test_streamed_body_is_rendered_like_a_body_in_memory(self):
+        rendered = self._generate(None)
+        self.assertTrue("<h1>Part 2</h1>" in rendered)
+        self.assertEqual(self._generate(10), rendered)
+        # The converted body was removed
+        self.assertEqual(os.listdir(self.spill), [])
+
+    def test_body_is_converted_before_rendering(self):
+        SettingsManager.settings["LARGE_FILE_SIZE"] = None
+        page = RaccontoParser().parse(self.source, True)
+        template = Generator.jinja_env.get_template("page.j2")
+        render = template.render
+        converted = []
+        def checked_render(context):
+            converted.append(page._body is not None)
+            return render(context)
+        template.render = checked_render
+        Generator.generate(page, os.path.join(self.directory, "site"))
+        self.assertEqual(converted, [True])
+
+    def test_splice(self):
+        body = os.path.join(self.spill, "body.html")
+        f = open(body, 'w')
+        f.write("<p>body</p>")
+        f.close()
+        chunks = [u"<html>", u"[P]", u"<i>[P]</i>", u"</html>"]
+        self.assertEqual(u"".join(Generator._splice(chunks, u"[P]", body, 4)),
+                         u"<html><p>body</p><i><p>body</p></i></html>")
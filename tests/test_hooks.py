@@ -1,6 +1,6 @@
 import unittest
 
-from racconto.hooks.manager import HooksManager
+from racconto.hooks.manager import HooksManager, needs_bodies
 
 class MethodCallLogger(object):
     def __init__(self, meth):
@@ -55,3 +55,11 @@ class TestRunners(unittest.TestCase):
         HooksManager.before_each_hooks = [self.hook]
         HooksManager.run_before_each_hooks('')
         self.assertTrue(self.hook.was_called)
+
+    def test_needs_bodies(self):
+        HooksManager.before_all_hooks = [self.hook]
+        HooksManager.after_all_hooks = []
+        self.assertFalse(HooksManager.needs_bodies())
+        HooksManager.after_all_hooks = [needs_bodies(lambda pages, posts: None)]
+        self.assertTrue(HooksManager.needs_bodies())
+        HooksManager.after_all_hooks = []
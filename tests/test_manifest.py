@@ -0,0 +1,155 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from jinja2 import Environment, DictLoader
+
+from racconto.assets import AssetManifest
+from racconto.manifest import BuildManifest, settings_signature
+
+class ContentMock(object):
+    def __init__(self, template):
+        self.title = "a title"
+        self.config = {"title": "a title"}
+        self.template = template
+
+class TestBuildManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "page.md")
+        self.output = os.path.join(self.directory, "index.html")
+        for path in (self.source, self.output):
+            f = open(path, 'w')
+            f.write("content")
+            f.close()
+        self.templates = {"base.j2": "<html>{% block body %}{{ recent }}{% endblock %}</html>",
+                          "page.j2": "{% extends 'base.j2' %}",
+                          "other.j2": "other",
+                          }
+        self.env = Environment(loader=DictLoader(self.templates))
+        self.manifest = BuildManifest(os.path.join(self.directory, "manifest"))
+
+    def tearDown(self):
+        AssetManifest.reset()
+        shutil.rmtree(self.directory)
+
+    def _record_and_reload(self, assets=None):
+        digest = self.manifest.source_digest(self.source)
+        self.manifest.record(self.source, digest, ContentMock("page.j2"),
+                             self.env, self.output, assets)
+        self.manifest.save()
+        manifest = BuildManifest(self.manifest.path)
+        manifest.load()
+        return manifest, digest
+
+    def test_unchanged_source_is_fresh(self):
+        manifest, digest = self._record_and_reload()
+        record = manifest.fresh_record(self.source, digest, self.env)
+        self.assertEqual(record["config"], {"title": "a title"})
+
+    def test_changed_source_is_stale(self):
+        manifest, digest = self._record_and_reload()
+        self.assertEqual(manifest.fresh_record(self.source, "other", self.env), None)
+
+    def test_missing_output_is_stale(self):
+        manifest, digest = self._record_and_reload()
+        os.remove(self.output)
+        self.assertEqual(manifest.fresh_record(self.source, digest, self.env), None)
+
+    def test_source_saved_after_its_digest_is_read_again(self):
+        stat = os.stat(self.source)
+        digest = self.manifest.source_digest(self.source, stat)
+        # Saved while the build renders it
+        f = open(self.source, 'w')
+        f.write("new content")
+        f.close()
+        self.manifest.record(self.source, digest, ContentMock("page.j2"),
+                             self.env, self.output, stat=stat)
+        self.assertNotEqual(self.manifest.source_digest(self.source), digest)
+
+    def test_changed_parent_template_is_stale(self):
+        manifest, digest = self._record_and_reload()
+        self.templates["base.j2"] = "<body>{% block body %}{% endblock %}</body>"
+        self.assertEqual(manifest.fresh_record(self.source, digest, self.env), None)
+
+    def test_unrelated_template_change_is_fresh(self):
+        manifest, digest = self._record_and_reload()
+        self.templates["other.j2"] = "changed"
+        self.assertNotEqual(manifest.fresh_record(self.source, digest, self.env), None)
+
+    def test_changed_asset_is_stale(self):
+        AssetManifest.assets = {"app.css": {"fingerprinted": "app.1.css"},
+                                "other.css": {"fingerprinted": "other.1.css"}}
+        manifest, digest = self._record_and_reload({"app.css": "app.1.css"})
+        AssetManifest.assets["other.css"] = {"fingerprinted": "other.2.css"}
+        self.assertNotEqual(manifest.fresh_record(self.source, digest, self.env), None)
+        AssetManifest.assets["app.css"] = {"fingerprinted": "app.2.css"}
+        self.assertEqual(manifest.fresh_record(self.source, digest, self.env), None)
+
+    def test_changed_global_used_by_template_is_stale(self):
+        self.manifest.update_globals({"recent": "1", "other": "1"})
+        manifest, digest = self._record_and_reload()
+        self.assertFalse(manifest.update_globals({"recent": "1", "other": "1"}))
+        self.assertNotEqual(manifest.fresh_record(self.source, digest, self.env), None)
+        self.assertTrue(manifest.update_globals({"recent": "1", "other": "2"}))
+        self.assertNotEqual(manifest.fresh_record(self.source, digest, self.env), None)
+        self.assertTrue(manifest.update_globals({"recent": "2", "other": "2"}))
+        self.assertEqual(manifest.fresh_record(self.source, digest, self.env), None)
+
+    def test_template_sources_digest_ignores_globals(self):
+        digest = self.manifest.template_sources_digest(self.env, "page.j2")
+        self.manifest.update_globals({"recent": "1"})
+        self.assertEqual(self.manifest.template_sources_digest(self.env, "page.j2"), digest)
+        self.templates["base.j2"] = "changed"
+        self.manifest.forget_templates()
+        self.assertNotEqual(self.manifest.template_sources_digest(self.env, "page.j2"), digest)
+
+    def test_aggregates_changed(self):
+        digests = {self.source: "abc"}
+        self.assertTrue(self.manifest.aggregates_changed(digests, self.env))
+        self.assertFalse(self.manifest.aggregates_changed(digests, self.env))
+        digests["new.md"] = "def"
+        self.assertTrue(self.manifest.aggregates_changed(digests, self.env))
+
+    def test_index_file_changed(self):
+        self._record_and_reload()
+        content = [ContentMock("page.j2")]
+        content[0].source = self.source
+        self.assertTrue(self.manifest.index_file_changed(self.output, self.env, "page.j2",
+                                                         content, {"year": "2013"}))
+        self.assertFalse(self.manifest.index_file_changed(self.output, self.env, "page.j2",
+                                                          content, {"year": "2013"}))
+        self.assertTrue(self.manifest.index_file_changed(self.output, self.env, "page.j2",
+                                                         content, {"year": "2014"}))
+        self.assertTrue(self.manifest.index_file_changed(self.output, self.env, "page.j2",
+                                                         [], {"year": "2014"}))
+        self.assertEqual(self.manifest.prune_index_files(), [])
+        self.assertEqual(self.manifest.prune_index_files(), [self.output])
+
+    def test_index_file_with_changed_asset_changed(self):
+        self._record_and_reload()
+        content = [ContentMock("page.j2")]
+        content[0].source = self.source
+        arguments = (self.output, self.env, "page.j2", content, {})
+        AssetManifest.assets = {"app.css": {"fingerprinted": "app.1.css"}}
+        self.manifest.index_file_changed(*arguments)
+        self.manifest.index_file_assets(self.output, {"app.css": "app.1.css"})
+        digests = {self.source: "abc"}
+        self.manifest.aggregates_changed(digests, self.env)
+        self.assertFalse(self.manifest.aggregates_changed(digests, self.env))
+        self.assertFalse(self.manifest.index_file_changed(*arguments))
+        AssetManifest.assets = {"app.css": {"fingerprinted": "app.2.css"}}
+        self.assertTrue(self.manifest.aggregates_changed(digests, self.env))
+        self.assertTrue(self.manifest.index_file_changed(*arguments))
+
+    def test_changed_settings_forget_sources(self):
+        self._record_and_reload()
+        self.manifest.check_settings({"SITEDIR": "site"})
+        self.manifest.check_settings({"SITEDIR": "public"})
+        self.assertEqual(self.manifest.sources, {})
+
+    def test_settings_signature_describes_callables_by_name(self):
+        self.assertEqual(settings_signature({"FILTERS": {"f": settings_signature}}),
+                         settings_signature({"FILTERS": {"f": settings_signature}}))
@@ -1,5 +1,8 @@
 import unittest
 import datetime
+import gc
+import os
+import pickle
 
 from racconto.models import *
 
@@ -25,12 +28,63 @@ class TestContentBase(unittest.TestCase):
     def test_generated_slug(self):
         self.assertEqual(self.content_base.slug, "a-file-name")
 
+    def test_body_is_converted_on_first_access(self):
+        options = self.options.copy()
+        del options["body"]
+        options["markdown"] = "*lorem*"
+        content_base = ContentBase(options)
+        self.assertEqual(content_base.markdown, "*lorem*")
+        self.assertEqual(content_base.body, u"<p><em>lorem</em></p>\n")
+        # Markdown is released once converted
+        self.assertEqual(content_base.markdown, None)
+        self.assertEqual(content_base.template_context()["body"],
+                         u"<p><em>lorem</em></p>\n")
+
+    def test_release_body(self):
+        options = self.options.copy()
+        del options["body"]
+        options["markdown"] = "*lorem*"
+        content_base = ContentBase(options)
+        content_base.body
+        content_base.release_body()
+        self.assertEqual((content_base.markdown, content_base._body), (None, None))
+
+    def test_template_context(self):
+        options = self.options.copy()
+        options["config"] = {"title": "front matter title", "tags": ["a"]}
+        context = ContentBase(options).template_context()
+        self.assertEqual(context["title"], "front matter title")
+        self.assertEqual(context["tags"], ["a"])
+        self.assertEqual(context["body"], "lorem ipsum dolor si amet")
+        self.assertEqual(sorted(context), ["body", "tags", "title"])
+        self.assertRaises(KeyError, lambda: context["missing"])
+
+    def test_replaced_body_in_template_context(self):
+        context = self.content_base.template_context(body=u"placeholder")
+        self.assertEqual(context["body"], u"placeholder")
+        self.assertEqual(self.content_base._body, "lorem ipsum dolor si amet")
+
+    def test_content_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.content_base, "__dict__"))
+
     def test_custom_slug(self):
         other_options = self.options.copy()
         other_options["slug"] = "my-custom-slug"
         other_content_base = ContentBase(other_options)
         self.assertEqual(other_content_base.slug, "my-custom-slug")
 
+class TestPage(unittest.TestCase):
+
+    def _page(self, filepath):
+        return Page({"title": "About", "template": "page.j2", "body": "",
+                     "filepath": filepath, "config": ""})
+
+    def test_pages_in_subdirectories_keep_them(self):
+        self.assertEqual(self._page("./content/about.md").filepath, "about")
+        self.assertEqual(self._page("./content/docs/about.md").filepath, "docs/about")
+        self.assertEqual(self._page("./content/docs/team/about.md").filepath,
+                         "docs/team/about")
+
 class TestPost(unittest.TestCase):
 
     def setUp(self):
@@ -63,6 +117,47 @@ class TestPost(unittest.TestCase):
         self.assertEqual(post_list[-1].date, self.today)
         self.assertEqual(post_list[0].date, in_4_days)
 
+    def test_date_in_template_context(self):
+        self.options["date"] = self.today
+        self.options["config"] = {"date": "not a date"}
+        post = Post(self.options)
+        self.assertEqual(post.template_context()["date"], self.today)
+
+    def test_posts_can_be_pickled(self):
+        self.options["date"] = self.today
+        post = pickle.loads(pickle.dumps(Post(self.options), 2))
+        self.assertEqual(post.date, self.today)
+        self.assertEqual(post.slug, "a-post")
+        self.assertEqual(post.body, "lorem ipsum dolor si amet")
+
+class TestMemory(unittest.TestCase):
+
+    def _resident(self):
+        f = open("/proc/self/statm")
+        try:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        finally:
+            f.close()
+
+    def test_resident_size_per_post(self):
+        if not os.path.exists("/proc/self/statm"):
+            self.skipTest("/proc/self/statm is not available")
+        date = datetime.date(2013, 1, 1)
+        for count in (10000, 100000):
+            gc.collect()
+            before = self._resident()
+            posts = [Post({"title": "Post %d" % i,
+                           "template": "post.jinja",
+                           "markdown": None,
+                           "filepath": "content/2013-01-01-post-%d.md" % i,
+                           "config": {"title": "Post %d" % i},
+                           "date": date})
+                     for i in range(count)]
+            per_post = (self._resident() - before) / float(count)
+            # Strings and the config dict included
+            self.assertTrue(per_post < 1500, "%d bytes per post" % per_post)
+            del posts
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,13 +2,27 @@ import unittest
 import codecs
 import datetime
 import mock
+import os
+import shutil
+import tempfile
 
-from racconto.parsers import RaccontoParser, MissingYAMLFrontMatterError
+from racconto.parsers import RaccontoParser, MissingYAMLFrontMatterError, markdown_to_html, \
+    markdown_sections, link_definitions
+from racconto.settings_manager import SettingsManager
 
 class CodecsMock():
     """A mock class for codecs open function."""
     def __init__(self, data):
         self.data = data
+        self.position = 0
+    def read(self, size=-1):
+        """Return size bytes of data, or the rest of it"""
+        start = self.position
+        if size < 0:
+            self.position = len(self.data)
+        else:
+            self.position = min(len(self.data), start + size)
+        return self.data[start:self.position]
     def readlines(self):
         """Return a list of lines, each line is appended with
         newline
@@ -66,10 +80,111 @@ Body of the file.
         self.assertEqual(config, {"config": "value",
                                   "other": 123}
                          )
-        self.assertEqual(content, u"<p>Body of the file.</p>\n")
+        self.assertEqual(content, u"\nBody of the file.\n")
 
     def test_config_and_content_reader_with_invalid_data(self):
        codecs.open = mock.Mock(return_value=CodecsMock(self.invalid_file_content))
        self.assertRaises(MissingYAMLFrontMatterError,
                          self.parser._config_and_content_reader,
                          "")
+
+    def test_config_and_content_reader_ignores_separators_in_content(self):
+        content = self.valid_file_content + "\n---\n\nAfter the rule.\n"
+        codecs.open = mock.Mock(return_value=CodecsMock(content))
+        config, content = self.parser._config_and_content_reader("")
+        self.assertEqual(config, {"config": "value",
+                                  "other": 123}
+                         )
+        self.assertEqual(content, u"\nBody of the file.\n\n---\n\nAfter the rule.\n")
+
+    def test_config_and_content_reader_without_ending_separator(self):
+        codecs.open = mock.Mock(return_value=CodecsMock("---\nconfig: value\n"))
+        self.assertRaises(MissingYAMLFrontMatterError,
+                          self.parser._config_and_content_reader,
+                          "")
+
+    def test_config_and_content_reader_metadata_only(self):
+        file_mock = CodecsMock(self.valid_file_content + "x" * 10000)
+        codecs.open = mock.Mock(return_value=file_mock)
+        self.parser.CHUNK_SIZE = 16
+        config, content = self.parser._config_and_content_reader("", True)
+        self.assertEqual(config, {"config": "value",
+                                  "other": 123}
+                         )
+        self.assertEqual(content, None)
+        # The body was never read
+        self.assertTrue(file_mock.position < 100)
+
+    def test_markdown_to_html(self):
+        self.assertEqual(markdown_to_html(u"Body of the file."),
+                         u"<p>Body of the file.</p>\n")
+
+class TestLargeFiles(unittest.TestCase):
+
+    markdown = (u"# One\n\nText with [a link][ref].\n\n"
+                u"```\n# not a heading\n\n# nor this\n```\n\n"
+                u"## Two \u00e5\n\n- item\n- item\n\n"
+                u"# Three\n\nMore [text][ref].\n\n"
+                u"[ref]: http://example.com/\n")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "large.md")
+        f = open(self.path, 'wb')
+        f.write((u"---\ntitle: Large\n---\n" + self.markdown).encode('utf-8'))
+        f.close()
+        self.parser = RaccontoParser()
+        self.parser.SECTION_SIZE = 1
+
+    def tearDown(self):
+        SettingsManager.override(None)
+        shutil.rmtree(self.directory)
+
+    def test_sections_are_split_before_headings_outside_code(self):
+        sections = list(markdown_sections(self.markdown.splitlines(True), 1))
+        self.assertEqual([section.split(u"\n")[0] for section in sections],
+                         [u"# One", u"## Two \u00e5", u"# Three"])
+        self.assertEqual(u"".join(sections), self.markdown)
+
+    def test_sections_are_at_least_size_long(self):
+        sections = list(markdown_sections(self.markdown.splitlines(True), 60))
+        self.assertEqual(len(sections), 2)
+
+    def test_link_definitions(self):
+        lines = [u"[a]: http://a/\n", u"```\n", u"[b]: http://b/\n", u"```\n",
+                 u"[^1]: A footnote\n", u"text [c]: not one\n"]
+        self.assertEqual(link_definitions(lines), u"[a]: http://a/")
+
+    def test_spilled_body_is_converted_like_the_whole_file(self):
+        path = self.parser.spill_body(self.path, self.directory)
+        try:
+            f = codecs.open(path, 'r', 'utf-8')
+            html = f.read()
+            f.close()
+        finally:
+            os.remove(path)
+        self.assertEqual(html, markdown_to_html(self.markdown))
+        self.assertEqual(os.listdir(self.directory), ["large.md"])
+
+    def test_body_of_large_file_is_converted_in_sections(self):
+        SettingsManager.settings["LARGE_FILE_SIZE"] = 10
+        SettingsManager.settings["LARGE_FILE_SPILL_DIR"] = self.directory
+        page = self.parser.parse(self.path)
+        converted = []
+        def counting_markdown_to_html(markdown):
+            converted.append(markdown)
+            return markdown_to_html(markdown)
+        with mock.patch("racconto.parsers.markdown_to_html", counting_markdown_to_html):
+            with mock.patch.object(RaccontoParser, "SECTION_SIZE", 1):
+                self.assertEqual(page.body, markdown_to_html(self.markdown))
+        self.assertEqual(len(converted), 3)
+        self.assertEqual(os.listdir(self.directory), ["large.md"])
+
+    def test_large_files_are_parsed_metadata_only(self):
+        SettingsManager.settings["LARGE_FILE_SIZE"] = 10
+        page = self.parser.parse(self.path)
+        self.assertEqual(page.title, "Large")
+        self.assertEqual(page.markdown, None)
+        self.assertTrue(page.streams_body())
+        SettingsManager.settings["LARGE_FILE_SIZE"] = None
+        self.assertFalse(page.streams_body())
@@ -0,0 +1,47 @@
+import unittest
+
+from racconto.hooks.manager import HooksManager
+from racconto.profiler import Profiler
+
+def some_hook(*args):
+    pass
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        Profiler.enabled = True
+        Profiler.pop()
+
+    def tearDown(self):
+        Profiler.pop()
+        Profiler.enabled = False
+
+    def test_disabled_profiler_collects_nothing(self):
+        Profiler.enabled = False
+        with Profiler.timer("render", "a.md", "page.j2"):
+            pass
+        self.assertEqual(Profiler.pop(), None)
+
+    def test_timer_adds_to_phase_source_and_template(self):
+        with Profiler.timer("render", "a.md", "page.j2"):
+            pass
+        with Profiler.timer(None, "a.md"):
+            pass
+        timings = Profiler.pop()
+        self.assertEqual(timings["phases"]["render"][1], 1)
+        self.assertEqual(timings["sources"].keys(), ["a.md"])
+        self.assertEqual(timings["templates"].keys(), ["page.j2"])
+
+    def test_merge(self):
+        Profiler.add(1.0, "render", "a.md", "page.j2")
+        timings = Profiler.pop()
+        Profiler.add(0.5, "render", "a.md")
+        Profiler.merge(timings)
+        self.assertEqual(Profiler.phases["render"], [1.5, 2])
+        self.assertEqual(Profiler.sources["a.md"], 1.5)
+        self.assertEqual(Profiler.templates["page.j2"], 1.0)
+
+    def test_hooks_are_timed_by_name(self):
+        HooksManager.after_all_hooks = [some_hook]
+        HooksManager.run_after_all_hooks([], [])
+        self.assertEqual(Profiler.phases["after_all hook: some_hook"][1], 1)
@@ -0,0 +1,36 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto.server import Watcher
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.makedirs("content")
+        self._write("content/page.md", "content")
+        self.watcher = Watcher(["content"])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, data):
+        f = open(path, 'w')
+        f.write(data)
+        f.close()
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.watcher.poll(), set())
+
+    def test_added_modified_and_removed_files(self):
+        self._write("content/new.md", "new")
+        self._write("content/page.md", "changed content")
+        self.assertEqual(self.watcher.poll(),
+                         set(["./content/new.md", "./content/page.md"]))
+        os.remove("content/new.md")
+        self.assertEqual(self.watcher.poll(), set(["./content/new.md"]))
@@ -0,0 +1,72 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from racconto.static import StaticSync
+
+class TestStaticSync(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "static")
+        self.site = os.path.join(self.directory, "site")
+        self.destination = os.path.join(self.site, "static")
+        self._write("static/css/app.css", "body {}")
+        self._write("static/favicon.ico", "icon")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, path, data):
+        path = os.path.join(self.directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'w')
+        f.write(data)
+        f.close()
+
+    def _read(self, path):
+        f = open(os.path.join(self.directory, path))
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def _sync(self, **options):
+        sync = StaticSync(**options)
+        sync.sync(self.source, self.destination, ["favicon.ico"], self.site)
+        return sync.stats
+
+    def test_copies_files_and_root_files(self):
+        self.assertEqual(self._sync()["copied"], 2)
+        self.assertEqual(self._read("site/static/css/app.css"), "body {}")
+        self.assertEqual(self._read("site/favicon.ico"), "icon")
+        self.assertFalse(os.path.exists(os.path.join(self.destination, "favicon.ico")))
+
+    def test_unchanged_files_are_not_copied(self):
+        self._sync()
+        self.assertEqual(self._sync(), {"copied": 0, "unchanged": 2, "removed": 0})
+
+    def test_changed_files_are_copied(self):
+        self._sync()
+        self._write("static/css/app.css", "body { color: red }")
+        self.assertEqual(self._sync()["copied"], 1)
+        self.assertEqual(self._read("site/static/css/app.css"), "body { color: red }")
+
+    def test_touched_file_with_same_content_is_not_copied_with_hashes(self):
+        self._sync()
+        os.utime(os.path.join(self.source, "css/app.css"), (0, 0))
+        self.assertEqual(self._sync(hashes=True)["copied"], 0)
+        self.assertEqual(self._sync()["copied"], 0)
+
+    def test_removed_files_are_removed(self):
+        self._sync()
+        os.remove(os.path.join(self.source, "css/app.css"))
+        self.assertEqual(self._sync()["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.destination, "css")))
+
+    def test_hardlinks(self):
+        self._sync(hardlinks=True)
+        self.assertEqual(os.stat(os.path.join(self.source, "css/app.css")).st_ino,
+                         os.stat(os.path.join(self.destination, "css/app.css")).st_ino)
@@ -0,0 +1,68 @@
+import unittest
+
+from racconto.taxonomy import Taxonomy, term_slug, fold
+
+class PostMock(object):
+    def __init__(self, title, tags):
+        self.title = title
+        self.source = "content/%s.md" % title
+        self.config = {"tags": tags} if tags is not None else {}
+
+class TestTaxonomy(unittest.TestCase):
+
+    def setUp(self):
+        self.posts = [PostMock("newest", ["Python", "static sites"]),
+                      PostMock("middle", "python"),
+                      PostMock("untagged", None),
+                      PostMock("oldest", ["Static-Sites", "static sites", 2013])]
+        self.taxonomy = Taxonomy("tags", self.posts, "/tags/")
+
+    def test_terms_index_posts_in_order(self):
+        self.assertEqual([term.slug for term in self.taxonomy], ["2013", "python", "static-sites"])
+        self.assertEqual(self.taxonomy["python"].posts, self.posts[0:2])
+        self.assertEqual(self.taxonomy["static-sites"].posts, [self.posts[0], self.posts[3]])
+        self.assertEqual(self.taxonomy["python"].url, "/tags/python/")
+        self.assertEqual(self.taxonomy["python"].name, "Python")
+
+    def test_most_used_and_cloud(self):
+        self.assertEqual(self.taxonomy.most_used(1)[0].count, 2)
+        weights = dict((term.slug, weight) for term, weight in self.taxonomy.cloud(5))
+        self.assertEqual(weights, {"2013": 1, "python": 5, "static-sites": 5})
+        self.assertEqual(Taxonomy("tags", [], "/tags/").cloud(), [])
+
+    def test_digest_changes_with_posts(self):
+        digest = self.taxonomy.digest()
+        self.assertEqual(Taxonomy("tags", self.posts, "/tags/").digest(), digest)
+        self.posts[1].config["tags"] = ["other"]
+        self.assertNotEqual(Taxonomy("tags", self.posts, "/tags/").digest(), digest)
+
+    def test_term_slug(self):
+        self.assertEqual(term_slug(u"C++ & Python!"), "c-plus-plus-and-python")
+        self.assertEqual(term_slug(u"C#"), "c-sharp")
+        self.assertEqual(term_slug(u"++"), "plus-plus")
+
+    def test_punctuation_only_terms_get_a_digest(self):
+        self.assertEqual(len(term_slug(u"!!!")), 8)
+        self.assertNotEqual(term_slug(u"!!!"), term_slug(u"???"))
+        taxonomy = Taxonomy("tags", [PostMock("a", [u"!!!", u"???"])], "/tags/")
+        self.assertEqual(len(taxonomy), 2)
+        self.assertTrue(all(term.url != "/tags/" for term in taxonomy))
+
+    def test_symbols_keep_terms_apart(self):
+        taxonomy = Taxonomy("tags", [PostMock("a", [u"C", u"C++", u"C#"])], "/tags/")
+        self.assertEqual([term.slug for term in taxonomy], ["c", "c-plus-plus", "c-sharp"])
+        self.assertEqual([term.count for term in taxonomy], [1, 1, 1])
+
+    def test_colliding_slugs_are_disambiguated(self):
+        posts = [PostMock("a", [u"c.d"]), PostMock("b", [u"C d"]), PostMock("c", [u"c!d"])]
+        taxonomy = Taxonomy("tags", posts, "/tags/")
+        self.assertEqual(len(taxonomy), 3)
+        self.assertEqual(taxonomy["c-d"].name, u"C d")
+        slugs = [term.slug for term in taxonomy]
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertTrue(all(slug.startswith("c-d") for slug in slugs))
+        # Stable whatever the order of the posts
+        self.assertEqual([term.slug for term in Taxonomy("tags", posts[::-1], "/tags/")], slugs)
+
+    def test_fold(self):
+        self.assertEqual(fold(u" Static_sites "), fold(u"static-Sites"))
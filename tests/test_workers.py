@@ -0,0 +1,25 @@
+import unittest
+
+from racconto.workers import Workers
+
+class TestWorkers(unittest.TestCase):
+
+    def test_serial_map_keeps_order(self):
+        workers = Workers(1)
+        self.assertEqual(workers.pool, None)
+        self.assertEqual(list(workers._map(abs, [-3, 2, -1])), [3, 2, 1])
+
+    def test_pool_map_keeps_order(self):
+        workers = Workers(2)
+        try:
+            items = range(-50, 50)
+            self.assertEqual(list(workers._map(abs, items)), map(abs, items))
+        finally:
+            workers.close()
+
+    def test_pool_map_consumes_iterators(self):
+        workers = Workers(2)
+        try:
+            self.assertEqual(list(workers._map(abs, iter([-3, 2, -1]))), [3, 2, 1])
+        finally:
+            workers.close()